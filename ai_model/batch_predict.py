@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+
+
+def predict_cases(db, case_model, engine, criteria=(), chunk_size=32):
+    """
+    Score every case matching ``criteria`` in chunks of ``chunk_size``.
+
+    Cases are read with a keyset query on the primary key (only id and
+    image_path are loaded), each chunk is run through one
+    ``engine.predict_batch`` call and the results are written back with a
+    single bulk update and commit per chunk.
+
+    Yields:
+        tuple: (case_id, result) where result is the engine's result dict,
+        or None if the image could not be scored
+    """
+    last_id = 0
+    while True:
+        rows = (
+            db.query(case_model.id, case_model.image_path)
+            .filter(case_model.id > last_id, case_model.image_path.isnot(None), *criteria)
+            .order_by(case_model.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return
+        last_id = rows[-1].id
+
+        results = engine.predict_batch([row.image_path for row in rows])
+
+        updates = [
+            {
+                "id": row.id,
+                "ai_prediction": result["label"],
+                "ai_confidence": result["confidence"],
+                "ai_heatmap_path": result["heatmap"]
+            }
+            for row, result in zip(rows, results)
+            if result is not None
+        ]
+        if updates:
+            db.bulk_update_mappings(case_model, updates)
+            db.commit()
+
+        for row, result in zip(rows, results):
+            yield row.id, result
+
+
+def main(argv=None):
+    # Make the backend packages importable, as migrations/env.py does
+    backend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+    sys.path.append(backend_dir)
+
+    from database.database import SessionLocal
+    from models.models import Case, CaseStatus
+    from .inference import InferenceEngine
+
+    parser = argparse.ArgumentParser(description="Run batched AI predictions over cases in the database")
+    parser.add_argument("--case-ids", type=int, nargs="+", help="Only score these cases")
+    parser.add_argument("--status", choices=[s.value for s in CaseStatus], help="Only score cases with this status")
+    parser.add_argument("--chunk-size", type=int, default=32, help="Cases per forward pass and bulk update")
+    parser.add_argument("--model-path", default=None, help="Path to fine-tuned model weights")
+    args = parser.parse_args(argv)
+
+    criteria = []
+    if args.case_ids:
+        criteria.append(Case.id.in_(args.case_ids))
+    if args.status:
+        criteria.append(Case.status == CaseStatus(args.status))
+
+    engine = InferenceEngine(args.model_path)
+    db = SessionLocal()
+    processed = 0
+    failed = 0
+    try:
+        for case_id, result in predict_cases(db, Case, engine, criteria, chunk_size=args.chunk_size):
+            processed += 1
+            if result is None:
+                failed += 1
+                print(f"Case {case_id}: prediction failed")
+            else:
+                print(f"Case {case_id}: {result['label']} ({result['confidence']:.3f})")
+    finally:
+        db.close()
+
+    print(f"Processed {processed} cases, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
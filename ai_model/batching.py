@@ -0,0 +1,123 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+def collect_batch(source, max_batch_size, max_wait, stop=_STOP):
+    """
+    Block for the first item on ``source`` (a queue.Queue or
+    multiprocessing queue), then gather more until ``max_batch_size`` items
+    are collected or ``max_wait`` seconds have passed.
+
+    Returns:
+        tuple: (items, stopped) where stopped is True once ``stop`` was seen
+    """
+    first = source.get()
+    if first is stop:
+        return [], True
+
+    batch = [first]
+    deadline = time.monotonic() + max_wait
+    while len(batch) < max_batch_size:
+        remaining = deadline - time.monotonic()
+        try:
+            if remaining > 0:
+                item = source.get(timeout=remaining)
+            else:
+                item = source.get_nowait()
+        except queue.Empty:
+            break
+        if item is stop:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+class BatchScheduler:
+    """
+    Micro-batching front end for InferenceEngine.
+
+    Pending requests are collected for up to ``max_wait_ms`` (or until
+    ``max_batch_size`` requests are waiting) and then scored with a single
+    ``engine.predict_batch`` call on a dedicated worker thread, so async
+    handlers never block the event loop on a forward pass.
+    """
+
+    def __init__(self, engine, max_batch_size=8, max_wait_ms=10):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._closed = False
+        self._inflight = 0
+
+    def start(self):
+        """Start the worker thread if it is not already running"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BatchScheduler has been shut down")
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="inference-batcher", daemon=True
+                )
+                self._worker.start()
+
+    @property
+    def busy(self):
+        """True while requests are queued or being scored"""
+        return self._inflight > 0 or not self._queue.empty()
+
+    def submit(self, image_path):
+        """Queue an image for prediction and return a concurrent Future"""
+        self.start()
+        future = Future()
+        self._queue.put((image_path, future))
+        return future
+
+    async def predict(self, image_path):
+        """Awaitable wrapper around submit for use in async handlers"""
+        return await asyncio.wrap_future(self.submit(image_path))
+
+    def shutdown(self, wait=True):
+        """Stop accepting work; queued requests are still processed"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker
+        self._queue.put(_STOP)
+        if wait and worker is not None:
+            worker.join()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = collect_batch(self._queue, self.max_batch_size, self.max_wait)
+            if not batch:
+                continue
+
+            # Drop requests whose callers already gave up
+            batch = [(path, fut) for path, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            self._inflight = len(batch)
+            try:
+                results = self.engine.predict_batch([path for path, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._inflight = 0
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
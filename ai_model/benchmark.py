@@ -0,0 +1,104 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import torch
+
+from .execution import fixture_paths
+from .inference import InferenceEngine
+
+# Engine settings for each selectable execution mode
+MODES = {
+    "fp32": {},
+    "fp32-no-inference-mode": {"inference_mode": False},
+    "channels-last": {"channels_last": True},
+    "bf16": {"precision": "bf16"},
+    "bf16-channels-last": {"precision": "bf16", "channels_last": True},
+    "int8-dynamic": {"precision": "int8-dynamic"},
+    "int8-static": {"precision": "int8-static"},
+    "int8-static-channels-last": {"precision": "int8-static", "channels_last": True},
+}
+
+def run_mode(name, model_path, image_paths, batch_size, repeats, num_threads):
+    """
+    Time the prediction pass of one mode on pre-decoded fixture batches,
+    so decode cost does not blur the comparison.
+    Returns (per-batch latencies in seconds, rupture probabilities per image)
+    """
+    # Without a checkpoint the head is randomly initialised; seed it so every
+    # mode scores the same weights
+    torch.manual_seed(0)
+    engine = InferenceEngine(
+        model_path,
+        lazy_heatmaps=True,
+        num_threads=num_threads,
+        calibration_paths=image_paths,
+        **MODES[name]
+    )
+    batches = [
+        torch.stack([engine.load_tensor(path) for path in image_paths[start:start + batch_size]])
+        for start in range(0, len(image_paths), batch_size)
+    ]
+    engine.warmup(batch_size)
+
+    latencies = []
+    probabilities = None
+    for _ in range(repeats):
+        outputs = []
+        for batch in batches:
+            start = time.perf_counter()
+            output = engine.forward(batch)
+            latencies.append(time.perf_counter() - start)
+            outputs.append(torch.softmax(output, dim=1)[:, 1])
+        probabilities = torch.cat(outputs).numpy()
+    return np.array(latencies), probabilities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare latency, throughput and fp32 agreement of the engine's execution modes"
+    )
+    parser.add_argument("fixtures", help="Directory of fixture images (DICOM, PNG or JPEG)")
+    parser.add_argument("--model-path", default=None, help="Checkpoint to benchmark")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=5, help="Passes over the fixture set per mode")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op thread count")
+    args = parser.parse_args(argv)
+
+    image_paths = fixture_paths(args.fixtures)
+    if not image_paths:
+        parser.error(f"No fixture images found in {args.fixtures}")
+
+    modes = args.modes if "fp32" in args.modes else ["fp32"] + args.modes
+    print(f"{len(image_paths)} images, batch size {args.batch_size}, "
+          f"{args.threads or torch.get_num_threads()} threads\n")
+    print(f"{'mode':<28}{'p50 ms':>10}{'p99 ms':>10}{'img/s':>10}{'agree %':>10}{'max |dp|':>10}")
+
+    reference = None
+    for name in modes:
+        try:
+            latencies, probabilities = run_mode(
+                name, args.model_path, image_paths, args.batch_size, args.repeats, args.threads
+            )
+        except Exception as e:
+            print(f"{name:<28}failed: {str(e)}")
+            continue
+        if name == "fp32":
+            reference = probabilities
+
+        images_per_second = len(image_paths) * args.repeats / latencies.sum()
+        if reference is not None:
+            agreement = np.mean((probabilities >= 0.5) == (reference >= 0.5)) * 100
+            drift = np.max(np.abs(probabilities - reference))
+        else:
+            agreement = drift = float("nan")
+        print(f"{name:<28}{np.percentile(latencies, 50) * 1000:>10.1f}"
+              f"{np.percentile(latencies, 99) * 1000:>10.1f}{images_per_second:>10.1f}"
+              f"{agreement:>10.1f}{drift:>10.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
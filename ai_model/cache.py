@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    """SHA-256 of a file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Two-tier cache of prediction results.
+
+    Keys combine the SHA-256 of the image bytes with the model weights digest
+    and the transform config, so identical re-uploads hit the cache while a
+    change of weights or preprocessing never does. Hot entries live in an
+    in-process LRU; everything is persisted in a SQLite file whose total
+    payload size is capped by evicting the least recently used rows.
+    """
+
+    def __init__(self, db_path="static/cache/predictions.db", max_memory_entries=1024,
+                 max_disk_bytes=64 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.model_digest = None
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        # (path, size, mtime) -> content digest, so unchanged files are not re-hashed
+        self._digests = OrderedDict()
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " key TEXT PRIMARY KEY,"
+            " model_digest TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_predictions_last_access ON predictions (last_access)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM predictions").fetchone()[0]
+
+    def bind_model(self, model_digest):
+        """
+        Set the active model version and drop entries produced by any other
+        weights. Called by InferenceEngine whenever it loads a model.
+        """
+        with self._lock:
+            self.model_digest = model_digest
+            self._memory.clear()
+            self._conn.execute("DELETE FROM predictions WHERE model_digest != ?", (model_digest,))
+            self._conn.commit()
+            self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM predictions").fetchone()[0]
+
+    def content_digest(self, path):
+        """Digest of the file at path, memoized on (path, size, mtime)"""
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+            if digest is not None:
+                self._digests.move_to_end(memo_key)
+                return digest
+
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[memo_key] = digest
+            while len(self._digests) > self.max_memory_entries:
+                self._digests.popitem(last=False)
+        return digest
+
+    def key_for(self, path, transform_digest):
+        return f"{self.content_digest(path)}:{self.model_digest}:{transform_digest}"
+
+    def get(self, key):
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                return dict(result)
+
+            row = self._conn.execute("SELECT result FROM predictions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE predictions SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            result = json.loads(row[0])
+            self._remember(key, result)
+            return dict(result)
+
+    def put(self, key, result):
+        payload = json.dumps(result)
+        size = len(key) + len(payload)
+        with self._lock:
+            self._remember(key, result)
+            old = self._conn.execute("SELECT size FROM predictions WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._disk_bytes -= old[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO predictions (key, model_digest, result, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, self.model_digest, payload, size, time.time())
+            )
+            self._disk_bytes += size
+            self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM predictions")
+            self._conn.commit()
+            self._disk_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _remember(self, key, result):
+        self._memory[key] = dict(result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Delete least recently used rows until the disk tier fits its budget"""
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM predictions ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                return
+            for key, size in rows:
+                self._conn.execute("DELETE FROM predictions WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                self._disk_bytes -= size
+                if self._disk_bytes <= self.max_disk_bytes:
+                    return
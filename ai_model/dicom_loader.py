@@ -0,0 +1,143 @@
+import numpy as np
+import pydicom
+from pydicom.pixel_data_handlers.util import apply_modality_lut, apply_voi_lut
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# Values above this size are left on disk by dcmread until accessed
+DEFER_SIZE = "1 KB"
+
+
+def is_dicom(path):
+    """Check for the DICM magic after the 128 byte preamble"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(128)
+            return f.read(4) == b"DICM"
+    except OSError:
+        return False
+
+
+def _pixel_memmap(path, ds):
+    """
+    Memory-map uncompressed grayscale pixel data straight from the file.
+    Returns None when the data has to go through pydicom's decoders instead.
+    """
+    transfer_syntax = ds.file_meta.TransferSyntaxUID
+    if transfer_syntax.is_compressed or getattr(transfer_syntax, "is_deflated", False):
+        return None
+    if ds.get("SamplesPerPixel", 1) != 1 or ds.BitsAllocated not in (8, 16, 32):
+        return None
+
+    try:
+        elem = ds.get_item("PixelData", keep_deferred=True)  # pydicom >= 3
+    except TypeError:
+        elem = ds.get_item("PixelData")
+    offset = getattr(elem, "value_tell", None)
+    if offset is None or getattr(elem, "value", None) is not None:
+        return None
+
+    kind = "i" if ds.PixelRepresentation == 1 else "u"
+    byteorder = "<" if transfer_syntax.is_little_endian else ">"
+    dtype = np.dtype(f"{byteorder}{kind}{ds.BitsAllocated // 8}")
+    frames = int(ds.get("NumberOfFrames", 1) or 1)
+    shape = (frames, ds.Rows, ds.Columns)
+    if elem.length < np.prod(shape) * dtype.itemsize:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def _stored_bits(frame, ds):
+    """
+    Keep only the BitsStored low bits of raw pixel values, sign-extending
+    them for signed data, as pydicom's decoders do
+    """
+    bits_allocated = ds.BitsAllocated
+    bits_stored = ds.get("BitsStored", bits_allocated)
+    if bits_stored >= bits_allocated:
+        return frame
+    mask = (1 << bits_stored) - 1
+    if ds.PixelRepresentation == 1:
+        sign = 1 << (bits_stored - 1)
+        values = frame.astype(np.int64) & mask
+        return ((values ^ sign) - sign).astype(frame.dtype)
+    return frame & mask
+
+
+def _resample_axis(arr, size, axis):
+    """Area-average (or nearest-neighbour upsample) one axis to size"""
+    n = arr.shape[axis]
+    if n == size:
+        return arr
+    if n < size:
+        return np.take(arr, np.arange(size) * n // size, axis=axis)
+    edges = np.linspace(0, n, size + 1).astype(np.int64)
+    sums = np.add.reduceat(arr, edges[:-1], axis=axis)
+    counts = np.diff(edges).astype(arr.dtype)
+    shape = [1] * arr.ndim
+    shape[axis] = size
+    return sums / counts.reshape(shape)
+
+
+def read_dicom_pixels(path, size=224):
+    """
+    Decode a DICOM image to a (size, size) float32 array scaled to [0, 1].
+
+    Uncompressed pixel data is memory-mapped and decimated by an integer
+    stride before anything is copied, so only the rows that are actually
+    sampled get paged in. The modality and VOI LUTs (or window
+    centre/width) are applied to the decimated pixels, which are then
+    area-averaged down to the target size. Multi-frame objects use the
+    middle frame.
+    """
+    ds = pydicom.dcmread(path, defer_size=DEFER_SIZE)
+
+    pixels = _pixel_memmap(path, ds)
+    memmapped = pixels is not None
+    if not memmapped:
+        pixels = ds.pixel_array
+        if ds.get("SamplesPerPixel", 1) != 1:
+            pixels = pixels.mean(axis=-1)
+        if pixels.ndim == 2:
+            pixels = pixels[np.newaxis]
+
+    frame = pixels[pixels.shape[0] // 2]
+
+    # Integer decimation first, keeping at least 2x oversampling for the area average
+    stride = max(1, min(frame.shape[0], frame.shape[1]) // (2 * size))
+    frame = np.ascontiguousarray(frame[::stride, ::stride])
+    if memmapped:
+        # Raw words from the file may carry overlay or garbage bits above BitsStored
+        frame = _stored_bits(frame, ds)
+
+    frame = apply_modality_lut(frame, ds)
+    if "WindowCenter" in ds or "VOILUTSequence" in ds:
+        frame = apply_voi_lut(frame, ds)
+
+    frame = frame.astype(np.float32)
+    frame = _resample_axis(_resample_axis(frame, size, 0), size, 1)
+
+    low, high = frame.min(), frame.max()
+    if high > low:
+        frame = (frame - low) / (high - low)
+    else:
+        frame = np.zeros_like(frame)
+
+    if ds.get("PhotometricInterpretation") == "MONOCHROME1":
+        frame = 1.0 - frame
+    return frame.astype(np.float32)
+
+
+def load_dicom_tensor(path, size=224, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """
+    Decode a DICOM file into a normalized (3, size, size) tensor.
+    The grayscale channel is only replicated at the final resolution.
+    """
+    # Imported here so the API can use is_dicom without loading torch
+    import torch
+
+    pixels = torch.from_numpy(read_dicom_pixels(path, size))
+    mean = torch.tensor(mean, dtype=torch.float32).view(-1, 1, 1)
+    std = torch.tensor(std, dtype=torch.float32).view(-1, 1, 1)
+    return (pixels.unsqueeze(0) - mean) / std
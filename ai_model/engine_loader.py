@@ -0,0 +1,60 @@
+import threading
+
+
+class EngineLoader:
+    """
+    Lazily constructed InferenceEngine.
+
+    ``factory`` is only called on first use, or from a background thread
+    once ``start_background`` is called, so importing the API does not pay
+    for building the model. Attribute access is forwarded to the engine and
+    blocks until it is ready.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._engine = None
+        self._error = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def start_background(self):
+        """Build and warm up the engine on a daemon thread"""
+        with self._lock:
+            if self._thread is None and not self._ready.is_set():
+                self._thread = threading.Thread(target=self._load, name="engine-warmup", daemon=True)
+                self._thread.start()
+
+    def get(self):
+        if not self._ready.is_set():
+            with self._lock:
+                thread = self._thread
+            if thread is not None:
+                thread.join()
+            else:
+                self._load()
+        if self._error is not None:
+            raise RuntimeError(f"Inference engine failed to load: {self._error}")
+        return self._engine
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def _load(self):
+        with self._lock:
+            if self._ready.is_set():
+                return
+            try:
+                engine = self._factory()
+                engine.warmup()
+                self._engine = engine
+            except Exception as e:
+                print(f"Error loading inference engine: {str(e)}")
+                self._error = e
+            finally:
+                self._ready.set()
@@ -0,0 +1,77 @@
+import contextlib
+import os
+
+import torch
+import torch.nn as nn
+import torch.ao.quantization as quantization
+from torchvision.models.quantization import resnet50 as quantizable_resnet50
+
+PRECISIONS = ("fp32", "bf16", "int8-dynamic", "int8-static")
+
+IMAGE_EXTENSIONS = (".dcm", ".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+def fixture_paths(directory):
+    """Image files (DICOM, PNG, JPEG...) in a directory, for calibration or benchmarking"""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def quantization_backend():
+    """Pick the best available int8 kernel backend for this CPU"""
+    supported = torch.backends.quantized.supported_engines
+    for backend in ("x86", "fbgemm", "qnnpack"):
+        if backend in supported:
+            return backend
+    raise RuntimeError("No int8 quantization backend is available")
+
+
+def quantize_dynamic(model):
+    """
+    int8 weights with activations quantized on the fly (Linear layers only).
+    The ResNet-50 has a single Linear layer, the final fc, so this shrinks
+    the checkpoint slightly but barely changes latency; use int8-static for
+    a speedup.
+    """
+    return quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_static(backbone, calibration_batches):
+    """
+    Post-training static int8 quantization of a ResNet-50 backbone.
+
+    The weights are copied into torchvision's quantizable ResNet-50, conv/bn/relu
+    are fused, observers are calibrated on ``calibration_batches`` and the
+    model is converted to int8 kernels.
+    """
+    backend = quantization_backend()
+    torch.backends.quantized.engine = backend
+
+    qmodel = quantizable_resnet50(weights=None, quantize=False)
+    qmodel.fc = nn.Linear(backbone.fc.in_features, backbone.fc.out_features)
+    qmodel.load_state_dict(backbone.state_dict())
+    qmodel.eval()
+    qmodel.fuse_model()
+    qmodel.qconfig = quantization.get_default_qconfig(backend)
+    quantization.prepare(qmodel, inplace=True)
+
+    calibrated = False
+    with torch.no_grad():
+        for batch in calibration_batches:
+            qmodel(batch)
+            calibrated = True
+    if not calibrated:
+        raise ValueError("int8-static quantization needs at least one calibration batch")
+
+    quantization.convert(qmodel, inplace=True)
+    return qmodel
+
+
+def autocast(precision, device):
+    """bf16 autocast context for the bf16 precision, a no-op otherwise"""
+    if precision == "bf16":
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
@@ -0,0 +1,67 @@
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+
+def gradcam(model, batch):
+    """
+    Grad-CAM on the layer4 feature map, computed alongside the prediction.
+
+    The backbone runs once without autograd; only the pooling + fc head is
+    differentiated, with respect to the detached layer4 features, so the
+    backward pass is a tiny fraction of a full one. Each image's predicted
+    class score is summed before backpropagating, which yields every
+    image's gradients in a single call because samples are independent in
+    eval mode.
+
+    Returns:
+        tuple: (logits of shape (N, classes), CAMs of shape (N, H, W) in [0, 1]
+        at the input resolution)
+    """
+    with torch.no_grad():
+        features = model.forward_features(batch)
+    features = features.detach().requires_grad_(True)
+
+    with torch.enable_grad():
+        logits = model.forward_head(features)
+        target = logits.argmax(dim=1, keepdim=True)
+        score = logits.gather(1, target).sum()
+        grads, = torch.autograd.grad(score, features)
+
+    with torch.no_grad():
+        weights = grads.mean(dim=(2, 3), keepdim=True)
+        cams = torch.relu((weights * features).sum(dim=1, keepdim=True))
+        cams = F.interpolate(cams, size=batch.shape[-2:], mode="bilinear", align_corners=False).squeeze(1)
+        flat = cams.flatten(1)
+        low = flat.min(dim=1).values.view(-1, 1, 1)
+        high = flat.max(dim=1).values.view(-1, 1, 1)
+        cams = (cams - low) / (high - low).clamp_min(1e-8)
+
+    return logits.detach().float(), cams.float()
+
+
+def _jet(values):
+    """Map values in [0, 1] to RGB with a jet-style colormap"""
+    r = np.clip(1.5 - np.abs(4.0 * values - 3.0), 0.0, 1.0)
+    g = np.clip(1.5 - np.abs(4.0 * values - 2.0), 0.0, 1.0)
+    b = np.clip(1.5 - np.abs(4.0 * values - 1.0), 0.0, 1.0)
+    return np.stack([r, g, b], axis=-1)
+
+
+def render_overlays(batch, cams, mean, std, alpha=0.4):
+    """
+    Blend CAMs over the (de-normalized, grayscale) input images.
+    Works on the whole batch at once and returns uint8 RGB arrays (N, H, W, 3).
+    """
+    mean = torch.tensor(mean, dtype=batch.dtype, device=batch.device).view(1, -1, 1, 1)
+    std = torch.tensor(std, dtype=batch.dtype, device=batch.device).view(1, -1, 1, 1)
+    base = (batch * std + mean).clamp(0, 1).mean(dim=1).cpu().numpy()
+    heat = _jet(cams.cpu().numpy())
+    blended = (1.0 - alpha) * base[..., np.newaxis] + alpha * heat
+    return (blended * 255.0 + 0.5).astype(np.uint8)
+
+
+def save_overlay(overlay, path):
+    """Write one overlay as a maximally compressed PNG"""
+    Image.fromarray(overlay).save(path, "PNG", optimize=True, compress_level=9)
@@ -0,0 +1,65 @@
+import argparse
+import sys
+import zipfile
+
+import torch
+import torch.nn as nn
+import torchvision.models as models
+
+# Architectures are built locally from torchvision without pretrained weights;
+# trained weights always come from a local checkpoint
+BACKBONES = {
+    "resnet50": (models.resnet50, 2048),
+}
+
+
+def build_backbone(arch="resnet50", num_classes=2):
+    """Construct an untrained backbone with a num_classes output layer"""
+    try:
+        constructor, features = BACKBONES[arch]
+    except KeyError:
+        raise ValueError(f"Unknown architecture: {arch}")
+    backbone = constructor(weights=None)
+    backbone.fc = nn.Linear(features, num_classes)
+    return backbone
+
+
+def is_torchscript(path):
+    """TorchScript archives are zip files carrying compiled code and constants"""
+    if not zipfile.is_zipfile(path):
+        return False
+    with zipfile.ZipFile(path) as archive:
+        return any(name.endswith("constants.pkl") for name in archive.namelist())
+
+
+def load_weights(model, path, device):
+    """Load a state-dict checkpoint into model without touching the network"""
+    state_dict = torch.load(path, map_location=device)
+    model.load_state_dict(state_dict)
+    return model
+
+
+def export_torchscript(model, path):
+    """Script the finished model so later loads skip Python model construction"""
+    model.eval()
+    scripted = torch.jit.script(model)
+    torch.jit.save(scripted, path)
+    return path
+
+
+def main(argv=None):
+    from .inference import InferenceEngine
+
+    parser = argparse.ArgumentParser(description="Export a trained checkpoint as TorchScript")
+    parser.add_argument("checkpoint", help="State-dict checkpoint to load")
+    parser.add_argument("output", help="Where to write the TorchScript archive")
+    args = parser.parse_args(argv)
+
+    engine = InferenceEngine(args.checkpoint)
+    export_torchscript(engine.model, args.output)
+    print(f"Saved TorchScript model to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+from .batching import collect_batch
+
+# The socket lives in a directory only its owner can enter; connections
+# exchange pickles, so nobody else may reach it
+DEFAULT_ADDRESS = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(),
+    f"detcetra-inference-{os.getuid()}", "inference.sock"
+)
+AUTHKEY_FILE = "authkey"
+DEFAULT_TIMEOUT = 120.0
+
+
+def _private_dir(address):
+    """Create (or check) the socket's directory as owner-only"""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise RuntimeError(f"{directory} must be owned by this user and not accessible to others")
+    return directory
+
+
+def load_authkey(address, authkey=None, generate=False):
+    """
+    The pool's authentication key: authkey (e.g. from INFERENCE_POOL_AUTHKEY)
+    if given, otherwise the key file next to the socket. With generate, the
+    pool writes a fresh random key file when there is none. There is no
+    built-in key; without one, startup fails.
+    """
+    if authkey:
+        return authkey.encode() if isinstance(authkey, str) else authkey
+    path = os.path.join(os.path.dirname(os.path.abspath(address)), AUTHKEY_FILE)
+    if generate and not os.path.exists(path):
+        _private_dir(address)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    try:
+        with open(path) as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        key = ""
+    if not key:
+        raise RuntimeError(
+            f"No inference pool key: set INFERENCE_POOL_AUTHKEY or start the pool to create {path}"
+        )
+    return key.encode()
+
+
+def _worker_main(engine, jobs, results, max_batch_size, max_wait, threads, cache_path):
+    """
+    Inference worker process. The engine was built in the parent before
+    forking, so its weights are shared copy-on-write with every worker.
+    """
+    import torch
+    if threads:
+        torch.set_num_threads(threads)
+    if cache_path:
+        # SQLite handles must not cross a fork, so each worker opens its own
+        from .cache import PredictionCache
+        engine.attach_cache(PredictionCache(cache_path))
+    engine.warmup()
+
+    stop = False
+    while not stop:
+        batch, stop = collect_batch(jobs, max_batch_size, max_wait, stop=None)
+        predictions = [job for job in batch if job[2] == "predict"]
+        heatmaps = [job for job in batch if job[2] == "heatmap"]
+
+        if predictions:
+            try:
+                outputs = engine.predict_batch([job[3] for job in predictions])
+                results.put([(client_id, job_id, output, None)
+                             for (client_id, job_id, _, _), output in zip(predictions, outputs)])
+            except Exception as e:
+                results.put([(client_id, job_id, None, str(e)) for client_id, job_id, _, _ in predictions])
+
+        for client_id, job_id, _, image_path in heatmaps:
+            try:
+                results.put([(client_id, job_id, engine.generate_heatmap(image_path), None)])
+            except Exception as e:
+                results.put([(client_id, job_id, None, str(e))])
+
+
+class InferencePool:
+    """
+    Pool of inference worker processes behind a local socket.
+
+    The engine is loaded once in the pool process and the workers are
+    forked from it, so N workers share one copy of the weights. API
+    processes connect with InferenceClient; their jobs go onto a single
+    multiprocessing queue that idle workers drain in micro-batches.
+    """
+
+    def __init__(self, engine, num_workers=2, max_batch_size=8, max_wait_ms=10,
+                 threads_per_worker=None, cache_path=None,
+                 address=DEFAULT_ADDRESS, authkey=None):
+        self.engine = engine
+        self.num_workers = num_workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0) / 1000.0
+        self.threads_per_worker = threads_per_worker
+        self.cache_path = cache_path
+        self.address = address
+        self.authkey = load_authkey(address, authkey, generate=True)
+
+        self._context = multiprocessing.get_context("fork")
+        self._jobs = self._context.Queue()
+        self._results = self._context.Queue()
+        self._workers = []
+        self._connections = {}
+        self._send_locks = {}
+        self._lock = threading.Lock()
+        self._client_ids = itertools.count()
+
+    def start(self):
+        for i in range(self.num_workers):
+            worker = self._context.Process(
+                target=_worker_main,
+                args=(self.engine, self._jobs, self._results, self.max_batch_size,
+                      self.max_wait, self.threads_per_worker, self.cache_path),
+                name=f"inference-worker-{i}",
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        threading.Thread(target=self._route_results, name="inference-results", daemon=True).start()
+
+    def serve_forever(self):
+        _private_dir(self.address)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        os.chmod(self.address, 0o600)
+        with listener:
+            print(f"Inference pool with {self.num_workers} workers listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"Rejected inference client: {str(e)}")
+                    continue
+                client_id = next(self._client_ids)
+                with self._lock:
+                    self._connections[client_id] = conn
+                    self._send_locks[client_id] = threading.Lock()
+                threading.Thread(target=self._serve_client, args=(client_id, conn), daemon=True).start()
+
+    def shutdown(self):
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def _serve_client(self, client_id, conn):
+        try:
+            while True:
+                job_id, kind, image_path = conn.recv()
+                self._jobs.put((client_id, job_id, kind, image_path))
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._connections.pop(client_id, None)
+                self._send_locks.pop(client_id, None)
+            conn.close()
+
+    def _route_results(self):
+        while True:
+            for client_id, job_id, result, error in self._results.get():
+                with self._lock:
+                    conn = self._connections.get(client_id)
+                    send_lock = self._send_locks.get(client_id)
+                if conn is None:
+                    continue
+                try:
+                    with send_lock:
+                        conn.send((job_id, result, error))
+                except (EOFError, OSError):
+                    pass
+
+
+class InferenceClient:
+    """
+    API-side handle to an InferencePool.
+
+    Exposes the same predict / predict_batch / generate_heatmap calls as the
+    in-process engine and scheduler, so routes can switch between them.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, timeout=DEFAULT_TIMEOUT):
+        self.address = address
+        self.authkey = load_authkey(address, authkey)
+        self.timeout = timeout
+        self._conn = None
+        self._pending = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, image_path, kind="predict"):
+        """Send a job to the pool and return a concurrent Future for its result"""
+        future = Future()
+        with self._lock:
+            job_id = next(self._job_ids)
+            try:
+                conn = self._connect()
+                self._pending[job_id] = future
+                conn.send((job_id, kind, image_path))
+            except (EOFError, OSError, AuthenticationError) as e:
+                self._pending.pop(job_id, None)
+                self._conn = None
+                raise ConnectionError(f"Inference pool unavailable: {str(e)}")
+        # Timed-out (cancelled) jobs stop waiting for a result
+        future.add_done_callback(lambda _: self._forget(job_id))
+        return future
+
+    def _forget(self, job_id):
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"No result from the inference pool within {self.timeout}s")
+
+    async def predict(self, image_path):
+        future = self.submit(image_path)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No result from the inference pool within {self.timeout}s")
+
+    def predict_batch(self, image_paths):
+        """
+        One result per image, in input order, or None for images that failed,
+        timed out or could not be sent, as InferenceEngine.predict_batch does.
+        The whole batch shares one timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        futures = []
+        for image_path in image_paths:
+            try:
+                futures.append(self.submit(image_path))
+            except ConnectionError as e:
+                print(f"Error submitting {image_path}: {str(e)}")
+                futures.append(None)
+
+        results = []
+        for image_path, future in zip(image_paths, futures):
+            if future is None:
+                results.append(None)
+                continue
+            try:
+                results.append(future.result(timeout=max(deadline - time.monotonic(), 0)))
+            except FutureTimeoutError:
+                future.cancel()
+                print(f"No result for {image_path} from the inference pool within {self.timeout}s")
+                results.append(None)
+            except Exception as e:
+                print(f"Error predicting {image_path}: {str(e)}")
+                results.append(None)
+        return results
+
+    def generate_heatmap(self, image_path):
+        return self._result(self.submit(image_path, kind="heatmap"))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            threading.Thread(target=self._read_results, args=(self._conn,), daemon=True).start()
+        return self._conn
+
+    def _read_results(self, conn):
+        try:
+            while True:
+                job_id, result, error = conn.recv()
+                with self._lock:
+                    future = self._pending.pop(job_id, None)
+                if future is None or future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(result)
+        except (EOFError, OSError):
+            pass
+        # Connection lost: fail everything still waiting on it
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Inference pool connection closed"))
+
+
+def main(argv=None):
+    from .inference import InferenceEngine
+
+    parser = argparse.ArgumentParser(description="Run the inference worker pool")
+    parser.add_argument("--address", default=os.environ.get("INFERENCE_POOL_ADDRESS", DEFAULT_ADDRESS))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=int, default=10)
+    parser.add_argument("--model-path", default=os.environ.get("MODEL_PATH"))
+    parser.add_argument("--precision", default="fp32")
+    parser.add_argument("--lazy-heatmaps", action="store_true")
+    parser.add_argument("--cache-path", default=None, help="Prediction cache shared by the workers")
+    args = parser.parse_args(argv)
+
+    engine = InferenceEngine(args.model_path, precision=args.precision, lazy_heatmaps=args.lazy_heatmaps)
+    pool = InferencePool(
+        engine,
+        num_workers=args.workers,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        threads_per_worker=args.threads_per_worker,
+        cache_path=args.cache_path,
+        address=args.address,
+        authkey=os.environ.get("INFERENCE_POOL_AUTHKEY")
+    )
+    pool.start()
+    try:
+        pool.serve_forever()
+    except KeyboardInterrupt:
+        pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
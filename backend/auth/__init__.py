@@ -1,6 +1,5 @@
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password) 
\ No newline at end of file
+from .auth import (
+    pwd_context, password_hasher, HasherBusy, verify_password, get_password_hash, create_access_token,
+    create_refresh_token, refresh_tokens, InvalidRefreshToken, token_claims, get_current_user,
+    get_current_active_user, get_current_user_record
+)
@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -11,6 +11,9 @@ import string
 
 from database.database import get_db
 from models.models import User, UserRole
+from services.user_cache import user_cache
+from services.password_hasher import PasswordHasher, HasherBusy
+from services.refresh_tokens import RefreshTokenStore, InvalidRefreshToken
 
 # Security configuration
 SECRET_KEY = config('SECRET_KEY', default=''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(32)))
@@ -19,6 +22,9 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 MAX_LOGIN_ATTEMPTS = 5
 ACCOUNT_LOCKOUT_MINUTES = 30
+# Take the user's id, role and active flag from the signed token instead of the
+# database; changes then apply when the user's current token expires
+TRUST_TOKEN_CLAIMS = config('AUTH_TRUST_TOKEN_CLAIMS', default=False, cast=bool)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -29,16 +35,45 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# Async handlers hash and verify through this pool, never on the event loop
+password_hasher = PasswordHasher(
+    verify_password, get_password_hash,
+    workers=config('PASSWORD_HASH_WORKERS', default=2, cast=int),
+    max_queue=config('PASSWORD_HASH_MAX_QUEUE', default=16, cast=int)
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims(user: User) -> dict:
+    """Access token claims for a user, including those read in trusted-claims mode"""
+    role = user.role.value if hasattr(user.role, "value") else user.role
+    locked_until = user.account_locked_until.replace(tzinfo=timezone.utc).timestamp() if user.account_locked_until else None
+    return {"sub": user.username, "uid": user.id, "role": role, "active": bool(user.is_active),
+            "locked_until": locked_until}
+
+def _user_from_claims(payload: dict) -> Optional[User]:
+    # Tokens issued before the lockout claim existed fall back to the database
+    if not all(key in payload for key in ("uid", "role", "active", "locked_until")):
+        return None
+    try:
+        locked_until = payload["locked_until"]
+        return User(id=int(payload["uid"]), username=payload["sub"], role=UserRole(payload["role"]),
+                    is_active=bool(payload["active"]),
+                    account_locked_until=datetime.utcfromtimestamp(float(locked_until)) if locked_until else None)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+# Rotating refresh tokens, so clients renew access tokens without a password
+refresh_tokens = RefreshTokenStore(SECRET_KEY, ALGORITHM, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
@@ -57,12 +92,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
+        # Refresh tokens share the signing key but only work at /token/refresh;
+        # access tokens issued before the type claim existed have none
+        if payload.get("type", "access") != "access":
+            raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
+    user = _user_from_claims(payload) if TRUST_TOKEN_CLAIMS else None
     if user is None:
-        raise credentials_exception
+        user = user_cache.get(username)
+    if user is None:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            raise credentials_exception
+        user = user_cache.store(user)
     
     if not user.is_active:
         raise HTTPException(
@@ -83,6 +127,23 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_current_user_record(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
+    """
+    The current user with every column, for responses that serialize it.
+    In trusted-claims mode the user from get_current_user only has what the
+    token carries, so the row is loaded.
+    """
+    if not TRUST_TOKEN_CLAIMS:
+        return current_user
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
 def check_user_permissions(user: User, required_role: UserRole) -> bool:
     return user.role == required_role
 
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+
+from auth.auth import verify_password, get_password_hash
+from services.password_hasher import PasswordHasher, HasherBusy
+
+PASSWORD = "benchmark-password"
+
+
+def build_app(hasher: PasswordHasher, hashed_password: str) -> FastAPI:
+    """Logins verified on the event loop (the old behaviour) and through the pool, plus a cheap probe"""
+    app = FastAPI()
+
+    @app.post("/login/on-loop")
+    async def login_on_loop(request: Request):
+        form = await request.form()
+        if not verify_password(form["password"], hashed_password):
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.post("/login/off-loop")
+    async def login_off_loop(request: Request):
+        form = await request.form()
+        try:
+            verified = await hasher.verify(form["password"], hashed_password)
+        except HasherBusy:
+            raise HTTPException(status_code=503)
+        if not verified:
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    return app
+
+
+async def run(client, login_path, probe_path, username, logins, concurrency, probe_interval):
+    """
+    Fire logins from concurrency clients while probing probe_path every
+    probe_interval seconds. Returns (login latencies, login status codes,
+    probe latencies, elapsed seconds).
+    """
+    remaining = iter(range(logins))
+    login_latencies, statuses, probe_latencies = [], [], []
+    done = asyncio.Event()
+
+    async def login_client():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.post(login_path, data={"username": username, "password": PASSWORD})
+            login_latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+
+    async def probe():
+        # Latency counts from when each probe was due, so a stalled loop that
+        # delays the probe itself shows up too
+        due = time.perf_counter()
+        while True:
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            await client.get(probe_path)
+            probe_latencies.append(time.perf_counter() - due)
+            if done.is_set():
+                break
+            due += probe_interval
+
+    started = time.perf_counter()
+    prober = asyncio.ensure_future(probe())
+    await asyncio.gather(*(login_client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+    return np.array(login_latencies), np.array(statuses), np.array(probe_latencies), elapsed
+
+
+def report(name, login_latencies, statuses, probe_latencies, elapsed):
+    succeeded = int(np.sum(statuses == 200))
+    rejected = int(np.sum(statuses == 503))
+    print(f"{name:<12}{succeeded / elapsed:>10.1f}{np.percentile(login_latencies, 50) * 1000:>10.1f}"
+          f"{np.percentile(login_latencies, 99) * 1000:>10.1f}{rejected:>10}"
+          f"{np.percentile(probe_latencies, 50) * 1000:>10.1f}{np.percentile(probe_latencies, 99) * 1000:>10.1f}"
+          f"{probe_latencies.max() * 1000:>10.1f}")
+
+
+async def main_async(args):
+    header = (f"{'path':<12}{'logins/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'503s':>10}"
+              f"{'probe p50':>10}{'probe p99':>10}{'probe max':>10}")
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            print(header)
+            report(args.login_path, *await run(client, args.login_path, args.probe_path, args.username,
+                                               args.logins, args.concurrency, args.probe_interval))
+        return
+
+    hasher = PasswordHasher(verify_password, get_password_hash, workers=args.workers, max_queue=args.max_queue)
+    app = build_app(hasher, get_password_hash(PASSWORD))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                 timeout=60) as client:
+        print(f"{args.logins} logins from {args.concurrency} clients, {args.workers} hash workers, "
+              f"queue limit {args.max_queue}\n")
+        print(header)
+        for name in ("on-loop", "off-loop"):
+            report(name, *await run(client, f"/login/{name}", "/ping", args.username,
+                                    args.logins, args.concurrency, args.probe_interval))
+    hasher.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure login throughput and the latency other requests see while logins run"
+    )
+    parser.add_argument("--url", default=None,
+                        help="Benchmark a running server instead of comparing on- and off-loop hashing in-process")
+    parser.add_argument("--login-path", default="/auth/api/auth/token")
+    parser.add_argument("--probe-path", default="/")
+    parser.add_argument("--username", default="admin",
+                        help=f"With --url, a user whose password is '{PASSWORD}'")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="Seconds between probe requests")
+    parser.add_argument("--workers", type=int, default=2, help="Hash workers for the in-process comparison")
+    parser.add_argument("--max-queue", type=int, default=16, help="Queue limit for the in-process comparison")
+    args = parser.parse_args(argv)
+    asyncio.run(main_async(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
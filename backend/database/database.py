@@ -1,18 +1,103 @@
+import threading
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from decouple import config
 
+from database.pool import TimedQueuePool, TimedAsyncQueuePool, pool_status
+
 SQLALCHEMY_DATABASE_URL = config('DATABASE_URL')
+# Defaults to DATABASE_URL with its async driver (asyncpg, aiosqlite)
+ASYNC_DATABASE_URL = config('ASYNC_DATABASE_URL', default=None)
+
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=10, cast=int)
+DB_MAX_OVERFLOW = config('DB_MAX_OVERFLOW', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10.0, cast=float)
+DB_POOL_RECYCLE = config('DB_POOL_RECYCLE', default=1800, cast=int)
+DB_POOL_PRE_PING = config('DB_POOL_PRE_PING', default=True, cast=bool)
+DB_STATEMENT_TIMEOUT_MS = config('DB_STATEMENT_TIMEOUT_MS', default=30000, cast=int)
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def engine_options(url, asynchronous: bool = False) -> dict:
+    """Pool and timeout settings for an engine on url"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite":
+        # SQLite connections are local files; SQLAlchemy picks a suitable pool
+        return {}
+
+    options = {
+        "poolclass": TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT_MS and url.get_backend_name() == "postgresql":
+        if asynchronous:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+def async_url(url) -> str:
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}")
+    return str(url.set(drivername=driver))
+
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+_async_lock = threading.Lock()
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def get_async_engine():
+    """
+    The async engine, created on first use so the async driver is only
+    needed by deployments that serve async routes.
+    """
+    global _async_engine, _AsyncSessionLocal
+    with _async_lock:
+        if _async_engine is None:
+            from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+            url = ASYNC_DATABASE_URL or async_url(SQLALCHEMY_DATABASE_URL)
+            _async_engine = create_async_engine(url, **engine_options(url, asynchronous=True))
+            # Objects stay readable after commit without an implicit (blocking) refresh
+            _AsyncSessionLocal = sessionmaker(
+                _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+        return _async_engine
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_metrics() -> dict:
+    metrics = {"sync": pool_status(engine)}
+    if _async_engine is not None:
+        metrics["async"] = pool_status(_async_engine.sync_engine)
+    return metrics
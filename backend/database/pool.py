@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """Checkout wait times and timeouts for one connection pool"""
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self._recent.append(waited)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": 1000 * self.wait_total / max(self.checkouts + self.timeouts, 1),
+                "wait_p99_ms": 1000 * recent[int(len(recent) * 0.99)] if recent else 0.0,
+                "wait_max_ms": 1000 * self.wait_max,
+            }
+
+
+class _TimedCheckout:
+    """Times how long each checkout waits for a free connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine) -> Dict[str, object]:
+    """Size, usage and checkout wait times of an engine's pool"""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    # Pools without a fixed size (NullPool, StaticPool) lack these counters
+    for key, name in (("size", "size"), ("checked_out", "checkedout"),
+                      ("checked_in", "checkedin"), ("overflow", "overflow")):
+        method = getattr(pool, name, None)
+        if callable(method):
+            status[key] = method()
+    if isinstance(pool, _TimedCheckout):
+        status.update(pool.metrics.snapshot())
+    return status
@@ -1,14 +1,32 @@
-from fastapi import FastAPI
+import os
+import sys
+
+# Make the repository root importable, as migrations/env.py does for the
+# backend, so services can share helpers from ai_model
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
-from routes import cases, auth
-from database.database import engine, Base
+from routes import cases, auth, files, search
+from database.database import engine, Base, pool_metrics
+from services.search import search_index
+from services.case_stats import case_stats
+from services.user_cache import user_cache
+from auth.auth import get_current_active_user, check_user_permissions
+from models.models import User, UserRole
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# Keep the full-text index and the stats counters in step with case and review writes
+search_index.listen()
+case_stats.listen()
+# Drop cached users when they are deactivated, locked or change role
+user_cache.listen()
+
 app = FastAPI(
     title="Breast Implant DX API",
     description="API for AI-assisted review of breast implant imaging studies",
@@ -30,11 +48,20 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(cases.router, prefix="/api", tags=["Cases"])
+app.include_router(files.router, prefix="/api", tags=["Files"])
+app.include_router(search.router, prefix="/api", tags=["Search"])
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Breast Implant DX API"}
 
+@app.get("/metrics/db")
+async def database_metrics(current_user: User = Depends(get_current_active_user)):
+    """Connection pool usage and checkout wait times (admins only)"""
+    if not check_user_permissions(current_user, UserRole.ADMIN):
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return pool_metrics()
+
 @app.get("/api/cases")
 async def get_cases():
     return JSONResponse(
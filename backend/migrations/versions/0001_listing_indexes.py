@@ -0,0 +1,47 @@
+"""Composite indexes for keyset-paginated case and review listings
+
+Revision ID: 0001_listing_indexes
+Revises: 
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_listing_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_cases_created_at_id", "cases", ["created_at", "id"]),
+    ("ix_cases_status_created_at_id", "cases", ["status", "created_at", "id"]),
+    ("ix_cases_modality_created_at_id", "cases", ["modality", "created_at", "id"]),
+    ("ix_cases_creator_id_created_at_id", "cases", ["creator_id", "created_at", "id"]),
+    ("ix_reviews_created_at_id", "reviews", ["created_at", "id"]),
+    ("ix_reviews_status_created_at_id", "reviews", ["status", "created_at", "id"]),
+    ("ix_reviews_case_id_created_at_id", "reviews", ["case_id", "created_at", "id"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for name, table, columns in INDEXES:
+        if table not in tables:
+            continue
+        # Databases created from either model set lack some of these columns
+        existing_columns = {column["name"] for column in inspector.get_columns(table)}
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table)}
+        if set(columns) <= existing_columns and name not in existing_indexes:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for name, table, _ in reversed(INDEXES):
+        if table in tables and name in {index["name"] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
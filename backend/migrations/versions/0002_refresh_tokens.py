@@ -0,0 +1,38 @@
+"""Store for rotating refresh tokens
+
+Revision ID: 0002_refresh_tokens
+Revises: 0001_listing_indexes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_refresh_tokens'
+down_revision = '0001_listing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The app's create_all may already have made the table
+    if "refresh_tokens" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("jti", sa.String(32), primary_key=True),
+        sa.Column("family", sa.String(32), nullable=False),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("expires_at", sa.DateTime, nullable=False),
+        sa.Column("used", sa.Boolean, nullable=False, server_default=sa.false()),
+    )
+    op.create_index("ix_refresh_tokens_family", "refresh_tokens", ["family"])
+    op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+    op.create_index("ix_refresh_tokens_expires_at", "refresh_tokens", ["expires_at"])
+
+
+def downgrade():
+    if "refresh_tokens" in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table("refresh_tokens")
@@ -0,0 +1,114 @@
+"""Case patient details, creator/reviewer and the review status enum
+
+Revision ID: 0003_case_details_review_status
+Revises: 0002_refresh_tokens
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_case_details_review_status'
+down_revision = '0002_refresh_tokens'
+branch_labels = None
+depends_on = None
+
+CASE_COLUMNS = [
+    ("patient_name", sa.String),
+    ("patient_age", sa.Integer),
+    ("patient_gender", sa.String),
+    ("case_number", sa.String),
+    ("heatmap_path", sa.String),
+    ("creator_id", sa.Integer),
+    ("reviewer_id", sa.Integer),
+]
+CASE_FOREIGN_KEYS = [
+    ("fk_cases_creator_id_users", "creator_id"),
+    ("fk_cases_reviewer_id_users", "reviewer_id"),
+]
+CASE_INDEXES = [
+    ("ix_cases_case_number", ["case_number"], True),
+    ("ix_cases_creator_id_created_at_id", ["creator_id", "created_at", "id"], False),
+]
+
+# Enum columns store member names; existing case-status reviews map onto
+# the nearest review status
+CASE_TO_REVIEW_STATUS = {
+    "PENDING": "DRAFT",
+    "REVIEWED": "SUBMITTED",
+    "ACCEPTED": "APPROVED",
+    "REJECTED": "REJECTED",
+}
+REVIEW_STATUS = sa.Enum("DRAFT", "SUBMITTED", "APPROVED", "REJECTED", name="reviewstatus")
+CASE_STATUS = sa.Enum("PENDING", "REVIEWED", "ACCEPTED", "REJECTED", name="casestatus")
+
+
+def _convert_review_status(mapping, to_type):
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        to_type.create(bind, checkfirst=True)
+        cases = " ".join(f"WHEN '{old}' THEN '{new}'" for old, new in mapping.items())
+        op.execute(
+            f"ALTER TABLE reviews ALTER COLUMN status TYPE {to_type.name} "
+            f"USING (CASE status::text {cases} END)::{to_type.name}"
+        )
+        return
+    # Elsewhere the enum is a plain string column
+    with op.batch_alter_table("reviews") as batch:
+        batch.alter_column("status", type_=sa.String(9))
+    for old, new in mapping.items():
+        op.execute(sa.text("UPDATE reviews SET status = :new WHERE status = :old").bindparams(old=old, new=new))
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if "cases" in tables:
+        existing = {column["name"] for column in inspector.get_columns("cases")}
+        # The app's create_all may already have added some of these
+        missing = [(name, type_) for name, type_ in CASE_COLUMNS if name not in existing]
+        if missing:
+            with op.batch_alter_table("cases") as batch:
+                for name, type_ in missing:
+                    batch.add_column(sa.Column(name, type_, nullable=True))
+                for fk_name, column in CASE_FOREIGN_KEYS:
+                    if column in dict(missing):
+                        batch.create_foreign_key(fk_name, "users", [column], ["id"])
+        existing_indexes = {index["name"] for index in inspector.get_indexes("cases")}
+        for name, columns, unique in CASE_INDEXES:
+            if name not in existing_indexes:
+                op.create_index(name, "cases", columns, unique=unique)
+
+    if "reviews" in tables:
+        status = next(column for column in inspector.get_columns("reviews") if column["name"] == "status")
+        # Only databases made by the old models still use the case statuses;
+        # without a native enum the mapping is a no-op on converted rows
+        if getattr(status["type"], "name", None) != "reviewstatus":
+            _convert_review_status(CASE_TO_REVIEW_STATUS, REVIEW_STATUS)
+        if "confidence_level" not in {column["name"] for column in inspector.get_columns("reviews")}:
+            op.add_column("reviews", sa.Column("confidence_level", sa.String, nullable=True))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    if "reviews" in tables:
+        if "confidence_level" in {column["name"] for column in inspector.get_columns("reviews")}:
+            with op.batch_alter_table("reviews") as batch:
+                batch.drop_column("confidence_level")
+        _convert_review_status({new: old for old, new in CASE_TO_REVIEW_STATUS.items()}, CASE_STATUS)
+        if op.get_bind().dialect.name == "postgresql":
+            REVIEW_STATUS.drop(op.get_bind(), checkfirst=True)
+
+    if "cases" in tables:
+        existing_indexes = {index["name"] for index in inspector.get_indexes("cases")}
+        for name, _, _ in reversed(CASE_INDEXES):
+            if name in existing_indexes:
+                op.drop_index(name, table_name="cases")
+        existing = {column["name"] for column in inspector.get_columns("cases")}
+        with op.batch_alter_table("cases") as batch:
+            for name, _ in reversed(CASE_COLUMNS):
+                if name in existing:
+                    batch.drop_column(name)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -13,6 +13,12 @@ class CaseStatus(str, enum.Enum):
 
 class Case(Base):
     __tablename__ = "cases"
+    # Listings filter on these columns and page by (created_at, id)
+    __table_args__ = (
+        Index("ix_cases_created_at_id", "created_at", "id"),
+        Index("ix_cases_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_cases_creator_id_created_at_id", "creator_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(String, index=True, nullable=False)
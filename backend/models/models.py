@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -17,6 +17,18 @@ class CaseStatus(str, enum.Enum):
     ACCEPTED = "accepted"
     REJECTED = "rejected"
 
+class ReviewStatus(str, enum.Enum):
+    DRAFT = "draft"
+    SUBMITTED = "submitted"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -28,34 +40,105 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     last_login = Column(DateTime, nullable=True)
+    failed_login_attempts = Column(Integer, default=0)
+    account_locked_until = Column(DateTime, nullable=True)
 
     reviews = relationship("Review", back_populates="reviewer")
+    cases = relationship("Case", back_populates="creator", foreign_keys="Case.creator_id")
 
 class Case(Base):
     __tablename__ = "cases"
+    # Listings filter on these columns and page by (created_at, id)
+    __table_args__ = (
+        Index("ix_cases_created_at_id", "created_at", "id"),
+        Index("ix_cases_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_cases_modality_created_at_id", "modality", "created_at", "id"),
+        Index("ix_cases_creator_id_created_at_id", "creator_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(String, index=True)
+    # Set for cases created through the API; DICOM ingest leaves them empty
+    patient_name = Column(String, nullable=True)
+    patient_age = Column(Integer, nullable=True)
+    patient_gender = Column(String, nullable=True)
+    case_number = Column(String, unique=True, index=True, nullable=True)
     accession_number = Column(String, unique=True, index=True)
     modality = Column(String)
     view = Column(String)
     image_path = Column(String)
     report_path = Column(String)
+    heatmap_path = Column(String, nullable=True)
+    report_images = Column(JSON, nullable=True)  # Rasterized report pages
+    notes = Column(Text, nullable=True)
     status = Column(Enum(CaseStatus), default=CaseStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    metadata = Column(JSON, nullable=True)  # For storing DICOM metadata
+    # "metadata" is reserved on declarative models, so the attribute is renamed
+    dicom_metadata = Column("metadata", JSON, nullable=True)  # For storing DICOM metadata
+    ai_prediction = Column(String, nullable=True)
+    ai_confidence = Column(Float, nullable=True)
+    ai_heatmap_path = Column(String, nullable=True)
+    creator_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    reviewer_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
+    creator = relationship("User", foreign_keys=[creator_id], back_populates="cases")
+    reviewer = relationship("User", foreign_keys=[reviewer_id])
     reviews = relationship("Review", back_populates="case")
+    prediction_jobs = relationship("PredictionJob", back_populates="case")
+    report_jobs = relationship("ReportJob", back_populates="case")
+    images = relationship("CaseImage", back_populates="case")
+    tag_index = relationship("DicomTagIndex", back_populates="case", uselist=False)
+
+class CaseImage(Base):
+    __tablename__ = "case_images"
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id"), index=True)
+    image_path = Column(String)
+    study_instance_uid = Column(String, index=True)
+    series_instance_uid = Column(String, index=True)
+    sop_instance_uid = Column(String, index=True)
+    modality = Column(String)
+    view = Column(String)
+    sha256 = Column(String, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    case = relationship("Case", back_populates="images")
+
+class DicomTagIndex(Base):
+    __tablename__ = "dicom_tag_index"
+
+    case_id = Column(Integer, ForeignKey("cases.id"), primary_key=True)
+    tags = Column(JSON, nullable=False)  # DICOM keyword -> value
+    indexed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    case = relationship("Case", back_populates="tag_index")
+
+class CaseStatCounter(Base):
+    __tablename__ = "case_stat_counters"
+
+    dimension = Column(String, primary_key=True)  # status, modality, ai_label, day, reviewer
+    value = Column(String, primary_key=True)  # "" for cases without a value
+    count = Column(Integer, nullable=False, default=0)
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_created_at_id", "created_at", "id"),
+        Index("ix_reviews_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_reviews_case_id_created_at_id", "case_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     case_id = Column(Integer, ForeignKey("cases.id"))
     reviewer_id = Column(Integer, ForeignKey("users.id"))
-    status = Column(Enum(CaseStatus))
+    status = Column(Enum(ReviewStatus), default=ReviewStatus.DRAFT)
     feedback = Column(String)
+    findings = Column(Text, nullable=True)
+    recommendations = Column(Text, nullable=True)
+    diagnosis = Column(String, nullable=True)
+    confidence_level = Column(String, nullable=True)
     ai_prediction = Column(String, nullable=True)
     ai_confidence = Column(Float, nullable=True)
     ai_heatmap_path = Column(String, nullable=True)
@@ -63,4 +146,51 @@ class Review(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     case = relationship("Case", back_populates="reviews")
-    reviewer = relationship("User", back_populates="reviews") 
\ No newline at end of file
+    reviewer = relationship("User", back_populates="reviews")
+
+class PredictionJob(Base):
+    __tablename__ = "prediction_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id"), index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+    prediction = Column(String, nullable=True)
+    confidence = Column(Float, nullable=True)
+    heatmap_path = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    case = relationship("Case", back_populates="prediction_jobs")
+
+class ReportJob(Base):
+    __tablename__ = "report_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_id = Column(Integer, ForeignKey("cases.id"), index=True)
+    status = Column(Enum(JobStatus), default=JobStatus.QUEUED, index=True)
+    report_path = Column(String)
+    page_count = Column(Integer, nullable=True)
+    pages_done = Column(Integer, default=0)
+    image_paths = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    case = relationship("Case", back_populates="report_jobs")
+
+class RefreshToken(Base):
+    """
+    One row per issued refresh token, keyed by its random id; the token
+    itself is never stored. Tokens rotated on the same login share a
+    family, and deleting a row revokes its token.
+    """
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String(32), primary_key=True)
+    family = Column(String(32), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+    used = Column(Boolean, default=False, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -13,6 +13,11 @@ class ReviewStatus(str, enum.Enum):
 
 class Review(Base):
     __tablename__ = "reviews"
+    __table_args__ = (
+        Index("ix_reviews_created_at_id", "created_at", "id"),
+        Index("ix_reviews_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_reviews_case_id_created_at_id", "case_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     status = Column(Enum(ReviewStatus), default=ReviewStatus.DRAFT, nullable=False)
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
 
 from database.database import get_db
-from models.user import User
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
-from schemas.auth import Token, TokenData, UserCreate, User as UserSchema
+from models.models import User
+from auth import (
+    password_hasher, HasherBusy, create_access_token, get_current_user_record, token_claims,
+    refresh_tokens, InvalidRefreshToken
+)
+from schemas.auth import Token, TokenData, RefreshRequest, UserCreate, User as UserSchema
 
 router = APIRouter(
     prefix="/api/auth",
@@ -22,7 +25,15 @@ async def login_for_access_token(
     db: Session = Depends(get_db)
 ):
     user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    try:
+        verified = user is not None and await password_hasher.verify(form_data.password, user.hashed_password)
+    except HasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -31,17 +42,62 @@ async def login_for_access_token(
     
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
+    )
+    refresh_token = refresh_tokens.issue(db, user.id, user.username)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/token/refresh", response_model=Token)
+def refresh_access_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token and a new refresh
+    token. Each refresh token works once; replaying one revokes every
+    token issued since the login it came from.
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        user_id, refresh_token = refresh_tokens.rotate(db, request.refresh_token)
+    except InvalidRefreshToken:
+        raise credentials_exception
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    locked = user is not None and user.account_locked_until and user.account_locked_until > datetime.utcnow()
+    if user is None or not user.is_active or locked:
+        refresh_tokens.revoke_user(db, user_id)
+        raise credentials_exception
+    
+    access_token = create_access_token(
+        data=token_claims(user), expires_delta=timedelta(minutes=30)
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
+def revoke_refresh_token(request: RefreshRequest, db: Session = Depends(get_db)):
+    """Sign out: revoke a refresh token and the ones rotated from the same login"""
+    try:
+        refresh_tokens.revoke(db, request.refresh_token)
+    except InvalidRefreshToken:
+        pass
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post("/register", response_model=UserSchema)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: Session = Depends(get_db)):
     db_user = db.query(User).filter(User.email == user.email).first()
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except HasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many registrations in progress, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
     db_user = User(
         username=user.username,
         email=user.email,
@@ -54,5 +110,5 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 @router.get("/me", response_model=UserSchema)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user_record)):
     return current_user 
\ No newline at end of file
@@ -1,20 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, noload, selectinload
+from typing import List, Optional, Set
 from datetime import datetime
+from decouple import config
+from pathlib import Path
 
-from database.database import get_db
+from database.database import get_db, get_async_db
 from models.models import User, Case, Review, CaseStatus, ReviewStatus
 from schemas.case import CaseCreate, CaseUpdate, CaseResponse, ReviewCreate, ReviewResponse
 from auth.auth import get_current_active_user
-from services.storage import StorageService
+from services.storage import storage_from_config
+from services.previews import PreviewService, LEVELS, FORMATS
+from services.pagination import keyset_query, page_rows, NEXT_CURSOR_HEADER
+from services.case_stats import case_stats
 
 router = APIRouter()
-storage_service = StorageService()
+storage_service = storage_from_config()
+preview_service = PreviewService(
+    cache_dir=config('PREVIEW_CACHE_DIR', default='static/previews'),
+    max_cache_bytes=config('PREVIEW_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+)
+# Render the preview pyramid when an image is stored rather than on first view
+PREVIEWS_ON_INGEST = config('PREVIEWS_ON_INGEST', default=True, cast=bool)
+
+# Nested collections that callers can leave out with include=
+CASE_INCLUDES = {"reviews": Case.reviews}
+DEFAULT_CASE_INCLUDES = "reviews"
+
+def _names(value: Optional[str], allowed, param: str) -> Optional[Set[str]]:
+    if value is None:
+        return None
+    names = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = names - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {param}: {', '.join(sorted(unknown))}")
+    return names
+
+def case_load_options(include: Set[str]):
+    """Load requested collections in one extra query each, and never lazily"""
+    return [
+        selectinload(relationship) if name in include else noload(relationship)
+        for name, relationship in CASE_INCLUDES.items()
+    ]
+
+def serialize_cases(cases, include: Set[str], fields: Optional[Set[str]]) -> list:
+    exclude = set(CASE_INCLUDES) - include
+    return [
+        CaseResponse.from_orm(case).dict(include=fields | include if fields else None, exclude=exclude or None)
+        for case in cases
+    ]
+
+def image_source(case: Case) -> Optional[Path]:
+    """Local path of a case's image"""
+    if not case.image_path:
+        return None
+    # Images saved by StorageService are relative to its base dir, DICOM uploads are not
+    source = storage_service.get_file_path(case.image_path)
+    if source is None and Path(case.image_path).exists():
+        source = Path(case.image_path)
+    return source
+
+def render_previews(path: str) -> None:
+    try:
+        preview_service.render_pyramid(path)
+    except Exception as e:
+        print(f"Error rendering previews for {path}: {str(e)}")
 
 @router.post("/cases/", response_model=CaseResponse)
 async def create_case(
     case: CaseCreate,
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -37,31 +97,101 @@ async def create_case(
     db.add(db_case)
     db.commit()
     db.refresh(db_case)
+    
+    if PREVIEWS_ON_INGEST:
+        background_tasks.add_task(render_previews, str(storage_service.get_file_path(image_path)))
     return db_case
 
 @router.get("/cases/", response_model=List[CaseResponse])
 async def get_cases(
-    skip: int = 0,
-    limit: int = 100,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     status: Optional[CaseStatus] = None,
+    modality: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    order: str = Query("desc", regex="^(asc|desc)$"),
+    include: Optional[str] = Query(DEFAULT_CASE_INCLUDES, description="Nested collections, e.g. reviews; empty for none"),
+    fields: Optional[str] = Query(None, description="Comma-separated case fields to return"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Case)
+    """
+    Cases by creation time, newest first unless ``order=asc``. Pages are
+    keyset-based: pass the ``X-Next-Cursor`` response header back as
+    ``cursor`` for the next page; it is absent on the last page.
+    """
+    include = _names(include, CASE_INCLUDES, "include")
+    fields = _names(fields, CaseResponse.__fields__, "fields")
+    
+    query = select(Case).options(*case_load_options(include))
     if status:
         query = query.filter(Case.status == status)
-    return query.offset(skip).limit(limit).all()
+    if modality:
+        query = query.filter(Case.modality == modality)
+    if created_from:
+        query = query.filter(Case.created_at >= created_from)
+    if created_to:
+        query = query.filter(Case.created_at < created_to)
+    
+    query = keyset_query(query, Case, cursor, limit, descending=order == "desc")
+    cases, next_cursor = page_rows((await db.execute(query)).scalars().all(), limit)
+    return JSONResponse(
+        jsonable_encoder(serialize_cases(cases, include, fields)),
+        headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    )
 
 @router.get("/cases/{case_id}", response_model=CaseResponse)
 async def get_case(
     case_id: int,
+    include: Optional[str] = Query(DEFAULT_CASE_INCLUDES, description="Nested collections, e.g. reviews; empty for none"),
+    fields: Optional[str] = Query(None, description="Comma-separated case fields to return"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    include = _names(include, CASE_INCLUDES, "include")
+    fields = _names(fields, CaseResponse.__fields__, "fields")
+    
+    query = select(Case).options(*case_load_options(include)).filter(Case.id == case_id)
+    case = (await db.execute(query)).scalars().first()
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    return JSONResponse(jsonable_encoder(serialize_cases([case], include, fields)[0]))
+
+@router.get("/cases/{case_id}/preview")
+async def get_case_preview(
+    case_id: int,
+    width: Optional[int] = None,
+    level: Optional[str] = None,
+    format: str = "jpeg",
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
+    """
+    Downsampled rendering of the case image. Pass the viewport ``width`` to
+    get the smallest level that covers it, or a ``level`` (thumb, screen,
+    full) directly.
+    """
+    if level is not None and level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"Unknown level, expected one of: {', '.join(LEVELS)}")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format, expected one of: {', '.join(FORMATS)}")
+    
     case = db.query(Case).filter(Case.id == case_id).first()
     if not case:
         raise HTTPException(status_code=404, detail="Case not found")
-    return case
+    
+    source = await run_in_threadpool(image_source, case)
+    if source is None:
+        raise HTTPException(status_code=404, detail="No image found for this case")
+    
+    try:
+        path = await run_in_threadpool(
+            preview_service.get, str(source), level or preview_service.level_for(width), format
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering preview: {str(e)}")
+    return FileResponse(path, media_type=FORMATS[format][1], headers={"Cache-Control": "private, max-age=86400"})
 
 @router.put("/cases/{case_id}", response_model=CaseResponse)
 async def update_case(
@@ -157,16 +287,5 @@ def get_case_stats(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_active_user)
 ):
-    total_cases = db.query(Case).count()
-    pending_cases = db.query(Case).filter(Case.status == CaseStatus.PENDING).count()
-    reviewed_cases = db.query(Case).filter(Case.status == CaseStatus.REVIEWED).count()
-    accepted_cases = db.query(Case).filter(Case.status == CaseStatus.ACCEPTED).count()
-    rejected_cases = db.query(Case).filter(Case.status == CaseStatus.REJECTED).count()
-    
-    return {
-        "total_cases": total_cases,
-        "pending_cases": pending_cases,
-        "reviewed_cases": reviewed_cases,
-        "accepted_cases": accepted_cases,
-        "rejected_cases": rejected_cases
-    } 
\ No newline at end of file
+    """Case counts by status, modality, AI label, reviewer and day"""
+    return case_stats.get(db)
\ No newline at end of file
@@ -1,33 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from decouple import config
+from typing import List, Optional
 import pydicom
 import os
 import shutil
+import uuid
 from datetime import datetime
 
 from ..database import get_db
-from ..models.models import Case, CaseStatus
+from ..models.models import Case, CaseImage, CaseStatus
 from ..schemas.case import CaseCreate, CaseResponse
 from ..auth import get_current_user
+from ..services.uploads import stream_upload, stream_form_file
+from ..services.study_ingest import (
+    ArchiveTooLarge, ExtractionBudget, expand_upload, parse_headers, group_by_study, instance_path
+)
+from ..services.metadata_index import MetadataIndex, read_tags_from_file
+from .predict import ingest_pipeline, job_queue
+from .cases import render_previews, PREVIEWS_ON_INGEST
 
 router = APIRouter()
 
+DICOM_DIR = "static/uploads/dicom"
+STAGING_DIR = "static/uploads/staging"
+STUDY_PARSE_WORKERS = config('STUDY_PARSE_WORKERS', default=8, cast=int)
+# Limits on what one study upload may unpack to
+STUDY_MAX_FILES = config('STUDY_MAX_FILES', default=5000, cast=int)
+STUDY_MAX_FILE_BYTES = config('STUDY_MAX_FILE_BYTES', default=512 * 1024 * 1024, cast=int)
+STUDY_MAX_TOTAL_BYTES = config('STUDY_MAX_TOTAL_BYTES', default=8 * 1024 * 1024 * 1024, cast=int)
+
+# Tags captured at ingest: a comma-separated list of keywords, or all of them
+_indexed_tags = config('DICOM_INDEX_TAGS', default='all')
+metadata_index = MetadataIndex(
+    keywords=None if _indexed_tags == 'all' else [t.strip() for t in _indexed_tags.split(',') if t.strip()],
+    max_entries=config('DICOM_METADATA_CACHE_SIZE', default=512, cast=int)
+)
+
+# Predict (with heatmap) in the background as soon as a DICOM is uploaded
+AUTO_PREDICT = config('AUTO_PREDICT', default=False, cast=bool)
+
+def _study_metadata(ds) -> dict:
+    return {
+        "patient_age": ds.PatientAge if hasattr(ds, 'PatientAge') else None,
+        "study_date": str(ds.StudyDate) if hasattr(ds, 'StudyDate') else None,
+        "study_time": str(ds.StudyTime) if hasattr(ds, 'StudyTime') else None,
+        "study_description": str(ds.StudyDescription) if hasattr(ds, 'StudyDescription') else None,
+        "series_description": str(ds.SeriesDescription) if hasattr(ds, 'SeriesDescription') else None,
+    }
+
+def _metadata_summary(tags: dict) -> dict:
+    def text(keyword):
+        value = tags.get(keyword)
+        return str(value) if value is not None else None
+    return {
+        "patient_id": tags.get("PatientID"),
+        "accession_number": tags.get("AccessionNumber"),
+        "modality": tags.get("Modality"),
+        "laterality": tags.get("ImageLaterality"),
+        "patient_age": tags.get("PatientAge"),
+        "study_date": text("StudyDate"),
+        "study_time": text("StudyTime"),
+        "study_description": text("StudyDescription"),
+        "series_description": text("SeriesDescription"),
+    }
+
+def _move_files(moves) -> List[str]:
+    """Move staged files into place; on failure, the ones already moved are removed"""
+    moved = []
+    try:
+        for source, target in moves:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+            moved.append(target)
+    except BaseException:
+        _remove_files(moved)
+        raise
+    return moved
+
+def _remove_files(paths) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def _duplicate_instances(db: Session, moves) -> List[str]:
+    """Targets that appear twice in the upload, already exist on disk or belong to another case"""
+    targets = [target for _, target in moves]
+    seen = set()
+    duplicates = set()
+    for target in targets:
+        if target in seen or os.path.exists(target):
+            duplicates.add(target)
+        seen.add(target)
+    for start in range(0, len(targets), 500):
+        chunk = targets[start:start + 500]
+        duplicates.update(
+            path for (path,) in db.query(CaseImage.image_path).filter(CaseImage.image_path.in_(chunk))
+        )
+    return sorted(duplicates)
+
+def _schedule_auto_predict(db: Session, case: Case) -> str:
+    if ingest_pipeline is not None and ingest_pipeline.submit(case.id, case.image_path):
+        return "queued"
+    # With a separate inference pool, or when the pipeline is full, queue a
+    # persistent prediction job so the upload still gets its prediction
+    job_queue.enqueue(db, case.id)
+    return "queued"
+
 @router.post("/upload")
 async def upload_dicom(
-    file: UploadFile = File(...),
+    request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
     try:
-        # Save DICOM file
-        file_path = f"static/uploads/dicom/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Read DICOM metadata
-        ds = pydicom.dcmread(file_path)
+        # Stream the "file" form field from the request body to disk, hashing
+        # it and parsing the header (everything before the pixel data) from
+        # the same chunks
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        stored, _, _ = await stream_form_file(
+            request,
+            lambda filename: f"static/uploads/dicom/{stamp}_{os.path.basename(filename)}",
+            parse_dicom_header=True
+        )
+        file_path = stored.path
+        ds = stored.header
         
         # Extract relevant metadata
         patient_id = ds.PatientID if hasattr(ds, 'PatientID') else None
@@ -43,22 +144,27 @@ async def upload_dicom(
             modality=modality,
             view=laterality,
             image_path=file_path,
-            metadata={
-                "patient_age": patient_age,
-                "study_date": str(ds.StudyDate) if hasattr(ds, 'StudyDate') else None,
-                "study_time": str(ds.StudyTime) if hasattr(ds, 'StudyTime') else None,
-                "study_description": str(ds.StudyDescription) if hasattr(ds, 'StudyDescription') else None,
-                "series_description": str(ds.SeriesDescription) if hasattr(ds, 'SeriesDescription') else None,
+            dicom_metadata={
+                **_study_metadata(ds),
+                "sha256": stored.sha256,
+                "file_size": stored.size,
             }
         )
         
         db.add(case)
+        db.flush()
+        metadata_index.store(db, case.id, ds)
         db.commit()
         db.refresh(case)
         
+        auto_predict = _schedule_auto_predict(db, case) if AUTO_PREDICT else "disabled"
+        if PREVIEWS_ON_INGEST:
+            background_tasks.add_task(render_previews, file_path)
+        
         return {
             "message": "DICOM file uploaded successfully",
             "case_id": case.id,
+            "auto_predict": auto_predict,
             "metadata": {
                 "patient_id": patient_id,
                 "accession_number": accession_number,
@@ -71,28 +177,159 @@ async def upload_dicom(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing DICOM file: {str(e)}")
 
-@router.get("/metadata/{case_id}")
-async def get_dicom_metadata(
-    case_id: int,
+@router.post("/upload/study")
+async def upload_study(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    case = db.query(Case).filter(Case.id == case_id).first()
-    if not case:
-        raise HTTPException(status_code=404, detail="Case not found")
-    
+    """
+    Ingest a whole study: any mix of DICOM files and ZIP/tar archives.
+    Instances are grouped by StudyInstanceUID/SeriesInstanceUID and each
+    study becomes one case with all of its images, in a single commit.
+    """
+    staging_dir = os.path.join(STAGING_DIR, uuid.uuid4().hex)
+    moved = []
     try:
-        ds = pydicom.dcmread(case.image_path)
+        # Stream every upload to the staging area and unpack archives
+        budget = ExtractionBudget(STUDY_MAX_FILES, STUDY_MAX_FILE_BYTES, STUDY_MAX_TOTAL_BYTES)
+        paths = []
+        digests = {}
+        for i, upload in enumerate(files):
+            name = os.path.basename(upload.filename or "upload")
+            stored = await stream_upload(upload, os.path.join(staging_dir, f"{i}_{name}"))
+            contents = await run_in_threadpool(expand_upload, stored.path, staging_dir, budget, stored.sha256)
+            for path, sha256 in contents:
+                paths.append(path)
+                digests[path] = sha256
+        
+        # Parse headers in parallel and group the instances
+        parsed, rejected = await run_in_threadpool(parse_headers, paths, STUDY_PARSE_WORKERS)
+        if not parsed:
+            raise HTTPException(status_code=400, detail="No DICOM instances found in upload")
+        studies = group_by_study(parsed)
+        
+        cases = []
+        moves = []
+        for study_uid, series in studies.items():
+            images = []
+            for series_uid, instances in series.items():
+                for path, ds in instances:
+                    final_path = instance_path(DICOM_DIR, study_uid, series_uid, ds, path)
+                    moves.append((path, final_path))
+                    images.append(CaseImage(
+                        image_path=final_path,
+                        sha256=digests[path],
+                        study_instance_uid=study_uid,
+                        series_instance_uid=series_uid,
+                        sop_instance_uid=str(ds.SOPInstanceUID) if hasattr(ds, 'SOPInstanceUID') else None,
+                        modality=ds.Modality if hasattr(ds, 'Modality') else None,
+                        view=ds.ImageLaterality if hasattr(ds, 'ImageLaterality') else None
+                    ))
+            
+            first = next(iter(series.values()))[0][1]
+            case = Case(
+                patient_id=first.PatientID if hasattr(first, 'PatientID') else None,
+                accession_number=first.AccessionNumber if hasattr(first, 'AccessionNumber') else None,
+                modality=first.Modality if hasattr(first, 'Modality') else None,
+                view=first.ImageLaterality if hasattr(first, 'ImageLaterality') else None,
+                image_path=images[0].image_path,
+                dicom_metadata={
+                    **_study_metadata(first),
+                    "study_instance_uid": study_uid,
+                    "series_count": len(series),
+                    "image_count": len(images),
+                },
+                images=images
+            )
+            db.add(case)
+            cases.append((study_uid, case, first))
+        
+        # A repeated SOP Instance UID would overwrite another instance's file
+        duplicates = _duplicate_instances(db, moves)
+        if duplicates:
+            db.rollback()
+            raise HTTPException(
+                status_code=409,
+                detail=f"Instances already stored or repeated in upload: "
+                       f"{', '.join(os.path.splitext(os.path.basename(p))[0] for p in duplicates[:20])}"
+            )
+        
+        db.flush()
+        for _, case, first in cases:
+            metadata_index.store(db, case.id, first)
+        
+        # Files are moved into place before the commit and removed again if it fails
+        moved = await run_in_threadpool(_move_files, moves)
+        # One transaction for every case and image in the upload
+        db.commit()
+        moved = []
+        if PREVIEWS_ON_INGEST:
+            for _, case, _ in cases:
+                background_tasks.add_task(render_previews, case.image_path)
+        
         return {
-            "patient_id": ds.PatientID if hasattr(ds, 'PatientID') else None,
-            "accession_number": ds.AccessionNumber if hasattr(ds, 'AccessionNumber') else None,
-            "modality": ds.Modality if hasattr(ds, 'Modality') else None,
-            "laterality": ds.ImageLaterality if hasattr(ds, 'ImageLaterality') else None,
-            "patient_age": ds.PatientAge if hasattr(ds, 'PatientAge') else None,
-            "study_date": str(ds.StudyDate) if hasattr(ds, 'StudyDate') else None,
-            "study_time": str(ds.StudyTime) if hasattr(ds, 'StudyTime') else None,
-            "study_description": str(ds.StudyDescription) if hasattr(ds, 'StudyDescription') else None,
-            "series_description": str(ds.SeriesDescription) if hasattr(ds, 'SeriesDescription') else None,
+            "message": "Study uploaded successfully",
+            "cases": [
+                {
+                    "case_id": case.id,
+                    "study_instance_uid": study_uid,
+                    "image_count": len(case.images),
+                    "auto_predict": _schedule_auto_predict(db, case) if AUTO_PREDICT else "disabled"
+                }
+                for study_uid, case, _ in cases
+            ],
+            "rejected_files": [os.path.basename(path) for path in rejected]
         }
+    
+    except HTTPException:
+        raise
+    except ArchiveTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading DICOM metadata: {str(e)}") 
\ No newline at end of file
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Error processing study upload: {str(e)}")
+    finally:
+        _remove_files(moved)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+@router.get("/metadata/{case_id}")
+async def get_dicom_metadata(
+    case_id: int,
+    tags: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    DICOM metadata served from the tag index. Pass ?tags=Keyword,Keyword to
+    get specific tags; the file is only read for tags outside the index, or
+    once for cases ingested before the index existed.
+    """
+    indexed = metadata_index.get(db, case_id)
+    case = None
+    if indexed is None:
+        case = db.query(Case).filter(Case.id == case_id).first()
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
+        try:
+            ds = await run_in_threadpool(pydicom.dcmread, case.image_path, stop_before_pixels=True)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error reading DICOM metadata: {str(e)}")
+        indexed = metadata_index.store(db, case.id, ds)
+        db.commit()
+    
+    if not tags:
+        return _metadata_summary(indexed)
+    
+    requested = [keyword.strip() for keyword in tags.split(",") if keyword.strip()]
+    values = {keyword: indexed.get(keyword) for keyword in requested}
+    outside = [keyword for keyword in requested if not metadata_index.covers(keyword)]
+    if outside:
+        if case is None:
+            case = db.query(Case).filter(Case.id == case_id).first()
+        try:
+            values.update(await run_in_threadpool(read_tags_from_file, case.image_path, outside))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Error reading DICOM metadata: {str(e)}")
+    return values
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from decouple import config
+
+from database.database import get_db
+from models.models import User, Case
+from auth.auth import get_current_active_user
+from services.file_serving import serve_file
+from routes.cases import storage_service, image_source
+
+router = APIRouter()
+
+# Let a reverse proxy send file bodies (e.g. X-Accel-Redirect for nginx, X-Sendfile for Apache)
+FILE_OFFLOAD_HEADER = config('FILE_OFFLOAD_HEADER', default=None)
+FILE_OFFLOAD_PREFIX = config('FILE_OFFLOAD_PREFIX', default='')
+
+def _serve(request: Request, path):
+    return serve_file(request, path, offload_header=FILE_OFFLOAD_HEADER, offload_prefix=FILE_OFFLOAD_PREFIX)
+
+@router.api_route("/files/{file_path:path}", methods=["GET", "HEAD"])
+async def get_file(
+    file_path: str,
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Download a stored file by the path StorageService returned for it, with
+    byte ranges, ETags and conditional requests. Nothing else under the
+    storage directory is served.
+    """
+    path = await run_in_threadpool(storage_service.servable_path, file_path)
+    if path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return await _serve(request, path)
+
+@router.api_route("/cases/{case_id}/image", methods=["GET", "HEAD"])
+async def get_case_image(
+    case_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Download the full-resolution image or DICOM of a case"""
+    case = db.query(Case).filter(Case.id == case_id).first()
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    path = await run_in_threadpool(image_source, case)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No image found for this case")
+    return await _serve(request, path)
@@ -1,16 +1,159 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from decouple import config
+import json
 import os
 
-from ..database import get_db
-from ..models.models import Case
+from ..database import get_db, SessionLocal
+from ..models.models import Case, CaseStatus
+from ..schemas.predict import BatchPredictRequest, BatchPredictResponse, PredictionJobResponse
+from ..services.prediction_jobs import PredictionJobQueue
+from ..services.ingest_pipeline import IngestPipeline
 from ..auth import get_current_user
-from ...ai_model.inference import InferenceEngine
+from ...ai_model.cache import PredictionCache
+from ...ai_model.batching import BatchScheduler
+from ...ai_model.engine_loader import EngineLoader
+from ...ai_model.worker_pool import InferenceClient, DEFAULT_ADDRESS, DEFAULT_TIMEOUT
 
 router = APIRouter()
 
-# Initialize inference engine
-engine = InferenceEngine()
+def _build_engine():
+    # Imported here so API workers don't load torch until the engine is built
+    from ...ai_model.inference import InferenceEngine
+    from ...ai_model.execution import fixture_paths
+    calibration_dir = config('INFERENCE_CALIBRATION_DIR', default=None)
+    return InferenceEngine(
+        config('MODEL_PATH', default=None),
+        cache=PredictionCache(
+            config('PREDICTION_CACHE_PATH', default='static/cache/predictions.db'),
+            max_memory_entries=config('PREDICTION_CACHE_MEMORY_ENTRIES', default=1024, cast=int),
+            max_disk_bytes=config('PREDICTION_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+        ),
+        lazy_heatmaps=config('LAZY_HEATMAPS', default=False, cast=bool),
+        precision=config('INFERENCE_PRECISION', default='fp32'),
+        channels_last=config('INFERENCE_CHANNELS_LAST', default=False, cast=bool),
+        num_threads=config('INFERENCE_THREADS', default=0, cast=int) or None,
+        calibration_paths=fixture_paths(calibration_dir) if calibration_dir else None
+    )
+
+if config('INFERENCE_BACKEND', default='local') == 'pool':
+    # Inference runs in a separate worker pool (python -m ai_model.worker_pool)
+    # that batches jobs from every API process; the client offers the same calls
+    engine = InferenceClient(
+        config('INFERENCE_POOL_ADDRESS', default=DEFAULT_ADDRESS),
+        authkey=config('INFERENCE_POOL_AUTHKEY', default=None),
+        timeout=config('INFERENCE_POOL_TIMEOUT', default=DEFAULT_TIMEOUT, cast=float)
+    )
+    scheduler = engine
+    ingest_pipeline = None
+else:
+    # The inference engine is built on first use, or warmed up in the background
+    # (INFERENCE_WARMUP=background); concurrent requests are micro-batched onto a
+    # worker thread so the forward pass never blocks the event loop
+    engine = EngineLoader(_build_engine)
+    if config('INFERENCE_WARMUP', default='background') == 'background':
+        engine.start_background()
+    scheduler = BatchScheduler(
+        engine,
+        max_batch_size=config('INFERENCE_MAX_BATCH_SIZE', default=8, cast=int),
+        max_wait_ms=config('INFERENCE_MAX_WAIT_MS', default=10, cast=int)
+    )
+    # Background predictions for new uploads, yielding to interactive requests
+    ingest_pipeline = IngestPipeline(
+        engine,
+        SessionLocal,
+        scheduler=scheduler,
+        max_pending=config('AUTO_PREDICT_MAX_PENDING', default=64, cast=int),
+        batch_size=config('AUTO_PREDICT_BATCH_SIZE', default=8, cast=int)
+    )
+
+# Asynchronous prediction jobs, queued in the database
+job_queue = PredictionJobQueue(
+    SessionLocal,
+    scheduler,
+    concurrency=config('PREDICTION_JOB_CONCURRENCY', default=16, cast=int)
+)
+
+@router.on_event("startup")
+async def resume_prediction_jobs():
+    # Jobs queued (or orphaned while running) before a restart don't wait for the next enqueue
+    await job_queue.resume()
+
+@router.post("/batch", status_code=202, response_model=BatchPredictResponse)
+async def predict_batch(
+    request: BatchPredictRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Queue a prediction job for each matching case and return the job ids;
+    poll GET /jobs/{job_id} (or its /events stream) for the results. Jobs
+    go through the same scheduler as interactive predictions.
+    """
+    if not request.case_ids and not request.status:
+        raise HTTPException(status_code=400, detail="Provide case_ids or a status filter")
+    
+    criteria = []
+    if request.case_ids:
+        criteria.append(Case.id.in_(request.case_ids))
+    if request.status:
+        try:
+            criteria.append(Case.status == CaseStatus(request.status))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Unknown case status: {request.status}")
+    
+    rows = db.query(Case.id, Case.image_path).filter(*criteria).order_by(Case.id).all()
+    case_ids = [row.id for row in rows if row.image_path]
+    job_ids = job_queue.enqueue_many(db, case_ids)
+    
+    return {
+        "queued": len(job_ids),
+        "jobs": [{"case_id": case_id, "job_id": job_id} for case_id, job_id in zip(case_ids, job_ids)],
+        "skipped_case_ids": [row.id for row in rows if not row.image_path]
+    }
+
+@router.get("/jobs/{job_id}", response_model=PredictionJobResponse)
+async def get_prediction_job(
+    job_id: int,
+    current_user = Depends(get_current_user)
+):
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_prediction_job(
+    job_id: int,
+    current_user = Depends(get_current_user)
+):
+    """Server-Sent Events stream of job updates, closed once the job finishes"""
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for update in job_queue.watch(job_id):
+            yield f"event: {update['status']}\ndata: {json.dumps(update)}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.post("/{case_id}/jobs", status_code=202, response_model=PredictionJobResponse)
+async def enqueue_prediction(
+    case_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    case = db.query(Case).filter(Case.id == case_id).first()
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    
+    if not case.image_path:
+        raise HTTPException(status_code=400, detail="No image found for this case")
+    
+    return job_queue.enqueue(db, case.id)
 
 @router.post("/{case_id}")
 async def predict_case(
@@ -28,7 +171,7 @@ async def predict_case(
             raise HTTPException(status_code=400, detail="No image found for this case")
         
         # Make prediction
-        result = engine.predict(case.image_path)
+        result = await scheduler.predict(case.image_path)
         if not result:
             raise HTTPException(status_code=500, detail="Error making prediction")
         
@@ -66,4 +209,30 @@ async def get_prediction(
         "prediction": case.ai_prediction,
         "confidence": case.ai_confidence,
         "heatmap_path": case.ai_heatmap_path
-    } 
\ No newline at end of file
+    }
+
+@router.get("/{case_id}/heatmap")
+async def get_heatmap(
+    case_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    case = db.query(Case).filter(Case.id == case_id).first()
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    
+    if not case.image_path:
+        raise HTTPException(status_code=400, detail="No image found for this case")
+    
+    # Heatmaps are generated on first request when LAZY_HEATMAPS is enabled
+    if not case.ai_heatmap_path or not os.path.exists(case.ai_heatmap_path):
+        heatmap_path = await run_in_threadpool(engine.generate_heatmap, case.image_path)
+        if not heatmap_path:
+            raise HTTPException(status_code=500, detail="Error generating heatmap")
+        case.ai_heatmap_path = heatmap_path
+        db.commit()
+    
+    return {
+        "case_id": case.id,
+        "heatmap_path": case.ai_heatmap_path
+    }
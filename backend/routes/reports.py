@@ -1,59 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from decouple import config
 import os
-import shutil
 from datetime import datetime
-from pdf2image import convert_from_path
 
-from ..database import get_db
-from ..models.models import Case
+from ..database import get_db, SessionLocal
+from ..models.models import Case, ReportJob
+from ..schemas.report import ReportJobResponse
 from ..auth import get_current_user
+from ..services.uploads import UploadTooLarge, stream_form_file
+from ..services.report_rasterizer import ReportRasterizer
 
 router = APIRouter()
 
-@router.post("/upload/{case_id}")
+REPORT_DIR = "static/uploads/reports"
+REPORT_MAX_UPLOAD_BYTES = config('REPORT_MAX_UPLOAD_BYTES', default=200 * 1024 * 1024, cast=int)
+# Unfinished jobs at least this old (seconds) are restarted when the app starts
+REPORT_JOB_STALE_AFTER = config('REPORT_JOB_STALE_AFTER', default=0.0, cast=float)
+
+rasterizer = ReportRasterizer(
+    SessionLocal,
+    output_dir=REPORT_DIR,
+    workers=config('REPORT_RASTER_WORKERS', default=2, cast=int),
+    dpi=config('REPORT_RASTER_DPI', default=150, cast=int),
+    max_edge=config('REPORT_RASTER_MAX_EDGE', default=2048, cast=int) or None,
+    max_pages=config('REPORT_RASTER_MAX_PAGES', default=100, cast=int)
+)
+
+@router.on_event("startup")
+async def resume_report_jobs():
+    # Rendering happens in this process, so jobs interrupted by a restart are started again
+    await run_in_threadpool(rasterizer.resume, REPORT_JOB_STALE_AFTER)
+
+@router.post("/upload/{case_id}", status_code=202, response_model=ReportJobResponse)
 async def upload_report(
     case_id: int,
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    """
+    Save the PDF report in the "file" form field and rasterize its pages in
+    the background. Returns the job; poll GET /jobs/{job_id} for progress
+    and the page images.
+    """
+    # Check if case exists
+    case = db.query(Case).filter(Case.id == case_id).first()
+    if not case:
+        raise HTTPException(status_code=404, detail="Case not found")
+    
+    # Streamed from the request body, so an oversized report is refused
+    # as soon as it passes the limit rather than after it is on disk
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     try:
-        # Check if case exists
-        case = db.query(Case).filter(Case.id == case_id).first()
-        if not case:
-            raise HTTPException(status_code=404, detail="Case not found")
-        
-        # Save PDF file
-        file_path = f"static/uploads/reports/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Convert PDF to images
-        images = convert_from_path(file_path)
-        image_paths = []
-        
-        for i, image in enumerate(images):
-            image_path = f"static/uploads/reports/{os.path.splitext(os.path.basename(file_path))[0]}_page_{i+1}.jpg"
-            image.save(image_path, "JPEG")
-            image_paths.append(image_path)
-        
-        # Update case with report path
-        case.report_path = file_path
-        case.report_images = image_paths
-        db.commit()
-        
-        return {
-            "message": "Report uploaded successfully",
-            "case_id": case.id,
-            "report_path": file_path,
-            "image_paths": image_paths
-        }
-        
+        stored, _, _ = await stream_form_file(
+            request,
+            lambda filename: f"{REPORT_DIR}/{stamp}_{os.path.basename(filename or 'report.pdf')}",
+            max_bytes=REPORT_MAX_UPLOAD_BYTES
+        )
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="Report is too large")
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing report: {str(e)}")
+    
+    return rasterizer.enqueue(db, case.id, stored.path)
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+async def get_report_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    job = db.query(ReportJob).filter(ReportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 @router.get("/{case_id}")
 async def get_report(
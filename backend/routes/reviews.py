@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -7,6 +7,7 @@ from ..database import get_db
 from ..models import Review, Case
 from ..schemas import ReviewCreate, ReviewUpdate, Review as ReviewSchema
 from ..auth import get_current_user
+from ..services.pagination import keyset_page, NEXT_CURSOR_HEADER
 
 router = APIRouter(
     prefix="/api/reviews",
@@ -106,15 +107,30 @@ def get_review_by_case(
 
 @router.get("/", response_model=List[ReviewSchema])
 def get_reviews(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
     status: Optional[str] = None,
+    case_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    order: str = Query("desc", regex="^(asc|desc)$"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
+    """Reviews by creation time, paged with the ``X-Next-Cursor`` header as ``cursor``"""
     query = db.query(Review)
     
     if status:
         query = query.filter(Review.status == status)
+    if case_id:
+        query = query.filter(Review.case_id == case_id)
+    if created_from:
+        query = query.filter(Review.created_at >= created_from)
+    if created_to:
+        query = query.filter(Review.created_at < created_to)
     
-    return query.offset(skip).limit(limit).all() 
\ No newline at end of file
+    reviews, next_cursor = keyset_page(query, Review, cursor, limit, descending=order == "desc")
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return reviews 
\ No newline at end of file
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from database.database import get_db
+from models.models import User
+from auth.auth import get_current_active_user
+from services.search import search_index, DOC_TYPES
+
+router = APIRouter()
+
+@router.get("/search")
+def search(
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked full-text search over review findings, recommendations and
+    diagnoses, case notes and report text. ``types`` restricts the results
+    to a comma-separated subset of review, case and report.
+    """
+    doc_types = [t.strip() for t in types.split(",") if t.strip()] if types else list(DOC_TYPES)
+    unknown = [t for t in doc_types if t not in DOC_TYPES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+    
+    # Fetch one extra row to tell whether there is a next page
+    results = search_index.search(db, q, doc_types, limit=limit + 1, offset=offset)
+    return {
+        "query": q,
+        "results": results[:limit],
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(results) > limit
+    }
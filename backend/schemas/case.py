@@ -52,18 +52,27 @@ class ReviewResponse(ReviewBase):
 
     class Config:
         orm_mode = True
+        # The pydantic 2 name for orm_mode
+        from_attributes = True
 
 class CaseResponse(CaseBase):
+    # Cases ingested from DICOM have no patient details or creator
+    patient_id: Optional[str]
+    patient_name: Optional[str]
+    patient_age: Optional[int]
+    patient_gender: Optional[str]
+    case_number: Optional[str]
     id: int
     status: CaseStatus
     image_path: Optional[str]
     report_path: Optional[str]
     heatmap_path: Optional[str]
-    creator_id: int
+    creator_id: Optional[int]
     reviewer_id: Optional[int]
     created_at: datetime
     updated_at: datetime
     reviews: List[ReviewResponse] = []
 
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+        from_attributes = True 
\ No newline at end of file
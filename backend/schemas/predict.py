@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+class BatchPredictRequest(BaseModel):
+    case_ids: Optional[List[int]] = Field(None, description="Cases to score")
+    status: Optional[str] = Field(None, description="Score all cases with this status, e.g. pending")
+
+class BatchPredictJob(BaseModel):
+    case_id: int
+    job_id: int
+
+class BatchPredictResponse(BaseModel):
+    queued: int
+    jobs: List[BatchPredictJob]
+    skipped_case_ids: List[int] = Field(default_factory=list, description="Matching cases without an image")
+
+class PredictionJobResponse(BaseModel):
+    id: int
+    case_id: int
+    status: str
+    prediction: Optional[str]
+    confidence: Optional[float]
+    heatmap_path: Optional[str]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
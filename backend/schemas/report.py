@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+class ReportJobResponse(BaseModel):
+    id: int
+    case_id: int
+    status: str
+    report_path: Optional[str]
+    page_count: Optional[int]
+    pages_done: Optional[int]
+    image_paths: Optional[List[str]]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+    class Config:
+        orm_mode = True
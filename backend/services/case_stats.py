@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict
+
+from decouple import config
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.models import Case, CaseStatCounter, CaseStatus, Review
+
+# Case attribute behind each counted dimension
+CASE_DIMENSIONS = {"status": "status", "modality": "modality", "ai_label": "ai_prediction", "day": "created_at"}
+
+_UPSERT = text(
+    "INSERT INTO case_stat_counters (dimension, value, count) VALUES (:dimension, :value, :delta)"
+    " ON CONFLICT (dimension, value) DO UPDATE SET count = case_stat_counters.count + excluded.count"
+)
+
+
+def _value(dimension: str, raw) -> str:
+    if raw is None:
+        return ""
+    if dimension == "day":
+        return raw.date().isoformat()
+    return raw.value if hasattr(raw, "value") else str(raw)
+
+
+class CaseStats:
+    """
+    Case statistics for the dashboard, served from counters.
+
+    ``case_stat_counters`` holds a count per (dimension, value). ORM flushes
+    that add, change or delete cases and reviews adjust the counters in the
+    same transaction, so a read is one small SELECT. Bulk writes that skip
+    the ORM (prediction results, for instance) are caught up by ``rebuild``,
+    which recomputes every dimension with one GROUP BY each and runs when
+    the counters are older than ``reconcile_interval`` seconds. Reads are
+    cached for ``ttl`` seconds to absorb dashboard polling.
+    """
+
+    def __init__(self, ttl: float = 5.0, reconcile_interval: float = 900.0, days: int = 30):
+        self.ttl = ttl
+        self.reconcile_interval = reconcile_interval
+        self.days = days
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+        self._rebuilt_at = None
+
+    def listen(self) -> None:
+        if not event.contains(Session, "after_flush", self._after_flush):
+            event.listen(Session, "after_flush", self._after_flush)
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        deltas = Counter()
+        for obj in session.new:
+            if isinstance(obj, Case):
+                for dimension, attr in CASE_DIMENSIONS.items():
+                    deltas[(dimension, _value(dimension, getattr(obj, attr)))] += 1
+            elif isinstance(obj, Review):
+                deltas[("reviewer", _value("reviewer", obj.reviewer_id))] += 1
+        for obj in session.deleted:
+            if isinstance(obj, Case):
+                for dimension, attr in CASE_DIMENSIONS.items():
+                    deltas[(dimension, _value(dimension, getattr(obj, attr)))] -= 1
+            elif isinstance(obj, Review):
+                deltas[("reviewer", _value("reviewer", obj.reviewer_id))] -= 1
+        for obj in session.dirty:
+            if not isinstance(obj, Case):
+                continue
+            state = inspect(obj)
+            for dimension, attr in CASE_DIMENSIONS.items():
+                history = state.attrs[attr].history
+                # Without the old value the change is left to the next rebuild
+                if history.added and history.deleted:
+                    deltas[(dimension, _value(dimension, history.deleted[0]))] -= 1
+                    deltas[(dimension, _value(dimension, history.added[0]))] += 1
+
+        changes = [
+            {"dimension": dimension, "value": value, "delta": delta}
+            for (dimension, value), delta in deltas.items() if delta
+        ]
+        if changes:
+            session.connection().execute(_UPSERT, changes)
+            self.invalidate()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cached = None
+
+    def rebuild(self, db: Session) -> None:
+        """Recompute every counter from the cases and reviews tables"""
+        rows = []
+        for dimension, attr in CASE_DIMENSIONS.items():
+            column = getattr(Case, attr)
+            key = func.date(column) if dimension == "day" else column
+            for raw, count in db.query(key, func.count(Case.id)).group_by(key):
+                value = "" if raw is None else str(raw) if dimension == "day" else _value(dimension, raw)
+                rows.append({"dimension": dimension, "value": value, "count": count})
+        for reviewer_id, count in db.query(Review.reviewer_id, func.count(Review.id)).group_by(Review.reviewer_id):
+            rows.append({"dimension": "reviewer", "value": _value("reviewer", reviewer_id), "count": count})
+
+        db.query(CaseStatCounter).delete(synchronize_session=False)
+        if rows:
+            db.bulk_insert_mappings(CaseStatCounter, rows)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process rebuilt the counters at the same time
+            db.rollback()
+        with self._lock:
+            self._rebuilt_at = time.monotonic()
+            self._cached = None
+
+    def get(self, db: Session) -> Dict[str, object]:
+        now = time.monotonic()
+        with self._lock:
+            if self._cached is not None and now - self._cached_at < self.ttl:
+                return self._cached
+            stale = self._rebuilt_at is None or now - self._rebuilt_at > self.reconcile_interval
+
+        if stale and self._rebuild_lock.acquire(blocking=False):
+            try:
+                self.rebuild(db)
+            finally:
+                self._rebuild_lock.release()
+
+        counts = defaultdict(dict)
+        for row in db.query(CaseStatCounter).filter(CaseStatCounter.count != 0):
+            counts[row.dimension][row.value or None] = row.count
+        stats = self._summarize(counts)
+
+        with self._lock:
+            self._cached = stats
+            self._cached_at = time.monotonic()
+        return stats
+
+    def _summarize(self, counts) -> Dict[str, object]:
+        by_status = counts.get("status", {})
+        by_day = counts.get("day", {})
+        recent_days = sorted((day for day in by_day if day), reverse=True)[:self.days]
+        return {
+            "total_cases": sum(by_status.values()),
+            "pending_cases": by_status.get(CaseStatus.PENDING.value, 0),
+            "reviewed_cases": by_status.get(CaseStatus.REVIEWED.value, 0),
+            "accepted_cases": by_status.get(CaseStatus.ACCEPTED.value, 0),
+            "rejected_cases": by_status.get(CaseStatus.REJECTED.value, 0),
+            "by_status": by_status,
+            "by_modality": counts.get("modality", {}),
+            "by_ai_label": counts.get("ai_label", {}),
+            "by_reviewer": counts.get("reviewer", {}),
+            "by_day": {day: by_day[day] for day in sorted(recent_days)},
+        }
+
+
+case_stats = CaseStats(
+    ttl=config('STATS_CACHE_TTL', default=5.0, cast=float),
+    reconcile_interval=config('STATS_RECONCILE_SECONDS', default=900.0, cast=float)
+)
@@ -0,0 +1,181 @@
+import hashlib
+import mimetypes
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+CHUNK_SIZE = 256 * 1024
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+# ASGI extension for zero-copy file bodies (sendfile), where the server offers it
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+_SHA256_NAME = re.compile(r"^([0-9a-f]{64})(\.[a-z0-9]+)?$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range: bytes=...`` header into an inclusive
+    (start, end). Returns None when the whole file should be sent (no
+    header, or several ranges) and raises ValueError when unsatisfiable.
+    """
+    if not header or "," in header:
+        return None
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class _DigestMemo:
+    """SHA-256 of files memoized on (path, size, mtime)"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def digest(self, path: Path) -> str:
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            value = self._entries.get(memo_key)
+            if value is not None:
+                self._entries.move_to_end(memo_key)
+                return value
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        value = sha.hexdigest()
+        with self._lock:
+            self._entries[memo_key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+
+_digests = _DigestMemo()
+
+
+def file_etag(path: Path) -> Tuple[str, bool]:
+    """
+    Strong ETag for a file and whether its name is content-addressed.
+    Content-addressed files carry their SHA-256 in the name, so nothing is
+    read; other files are hashed once per (size, mtime).
+    """
+    match = _SHA256_NAME.match(path.name)
+    if match:
+        return f'"{match.group(1)}"', True
+    return f'"{_digests.digest(path)}"', False
+
+
+class FileRangeResponse(Response):
+    """
+    Sends bytes start..end (inclusive) of a file. Uses the ASGI zero-copy
+    send extension when the server supports it, otherwise reads the file in
+    chunks off the event loop.
+    """
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int = 200,
+                 headers: Optional[dict] = None, media_type: Optional[str] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({**(headers or {}), "content-length": str(end - start + 1)})
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        count = self.end - self.start + 1
+        f = await run_in_threadpool(open, self.path, "rb")
+        try:
+            if ZEROCOPY_EXTENSION in (scope.get("extensions") or {}):
+                await send({"type": ZEROCOPY_EXTENSION, "file": f.fileno(), "offset": self.start,
+                            "count": count, "more_body": False})
+                return
+            await run_in_threadpool(f.seek, self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            await run_in_threadpool(f.close)
+
+
+async def serve_file(request: Request, path: Path, media_type: Optional[str] = None,
+                     offload_header: Optional[str] = None, offload_prefix: str = "") -> Response:
+    """
+    Serve a file with strong ETags, If-None-Match (304), If-Range and
+    single byte-range (206) support. Content-addressed files get immutable
+    cache headers; others must be revalidated.
+
+    With offload_header (e.g. ``X-Accel-Redirect``), the body is left to the
+    reverse proxy, which sends the file at offload_prefix + path with sendfile.
+    """
+    etag, immutable = await run_in_threadpool(file_etag, path)
+    size = (await run_in_threadpool(path.stat)).st_size
+    headers = {
+        "etag": etag,
+        "accept-ranges": "bytes",
+        "cache-control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = media_type or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if offload_header:
+        headers[offload_header] = f"{offload_prefix}{path.as_posix()}"
+        return Response(headers=headers, media_type=media_type)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+    if byte_range is None:
+        if size == 0:
+            return Response(headers=headers, media_type=media_type)
+        return FileRangeResponse(path, 0, size - 1, headers=headers, media_type=media_type)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, status_code=206, headers=headers, media_type=media_type)
@@ -0,0 +1,126 @@
+import queue
+import threading
+import time
+
+from models.models import Case
+
+
+class IngestPipeline:
+    """
+    Background prediction stage for freshly uploaded images.
+
+    ``submit`` hands a case to a decode thread that builds the 224x224
+    tensor; decoded tensors are then scored in micro-batches, with heatmaps,
+    and written to the case, so the result is ready before anyone opens it.
+    Images already in the engine's prediction cache (with a heatmap) skip
+    decoding and scoring.
+
+    Backpressure keeps bulk uploads from starving interactive traffic:
+    at most ``max_pending`` uploads wait for decoding (``submit`` returns
+    False instead of blocking when that is exceeded), the decoded queue is
+    bounded so decoding stalls when scoring falls behind, and scoring waits
+    while the interactive ``scheduler`` has requests queued or in flight.
+    """
+
+    def __init__(self, engine, session_factory, scheduler=None, max_pending: int = 64,
+                 batch_size: int = 8, max_wait_ms: int = 50, yield_interval: float = 0.05):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.scheduler = scheduler
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.yield_interval = yield_interval
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._decoded = queue.Queue(maxsize=batch_size * 2)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for target, name in ((self._decode_loop, "ingest-decode"), (self._predict_loop, "ingest-predict")):
+                thread = threading.Thread(target=target, name=name, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, case_id: int, image_path: str) -> bool:
+        """Queue a case for background prediction; False if the pipeline is full"""
+        self.start()
+        try:
+            self._pending.put_nowait((case_id, image_path))
+            return True
+        except queue.Full:
+            return False
+
+    def _decode_loop(self):
+        while True:
+            case_id, image_path = self._pending.get()
+            try:
+                cache_key, cached = self.engine.cached_prediction(image_path)
+                if cached is not None and cached.get("heatmap"):
+                    self._save([(case_id, image_path, None, cache_key)], [cached])
+                    continue
+                tensor = self.engine.load_tensor(image_path)
+            except Exception as e:
+                print(f"Error decoding {image_path} for case {case_id}: {str(e)}")
+                continue
+            self._decoded.put((case_id, image_path, tensor, cache_key))
+
+    def _predict_loop(self):
+        while True:
+            batch = [self._decoded.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._decoded.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._predict(batch)
+            except Exception as e:
+                # Keep the thread alive, or the queues fill and every later upload stalls
+                print(f"Error predicting cases {[case_id for case_id, _, _, _ in batch]}: {str(e)}")
+
+    def _predict(self, batch):
+        # Interactive predictions go first
+        while self.scheduler is not None and self.scheduler.busy:
+            time.sleep(self.yield_interval)
+
+        results = self.engine.predict_tensors(
+            [image_path for _, image_path, _, _ in batch],
+            [tensor for _, _, tensor, _ in batch],
+            heatmaps=True
+        )
+        for (_, _, _, cache_key), result in zip(batch, results):
+            try:
+                self.engine.cache_prediction(cache_key, result)
+            except Exception as e:
+                print(f"Error caching prediction: {str(e)}")
+        self._save(batch, results)
+
+    def _save(self, batch, results):
+        updates = [
+            {
+                "id": case_id,
+                "ai_prediction": result["label"],
+                "ai_confidence": result["confidence"],
+                "ai_heatmap_path": result["heatmap"]
+            }
+            for (case_id, _, _, _), result in zip(batch, results)
+            if result is not None
+        ]
+        if not updates:
+            return
+        db = self.session_factory()
+        try:
+            db.bulk_update_mappings(Case, updates)
+            db.commit()
+        except Exception as e:
+            print(f"Error saving background predictions: {str(e)}")
+        finally:
+            db.close()
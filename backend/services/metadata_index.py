@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import pydicom
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models.models import DicomTagIndex
+
+_PENDING = "metadata_index_pending"
+
+# Bulk binary values are never indexed
+BINARY_VRS = {"OB", "OW", "OF", "OD", "OL", "OV", "UN"}
+
+
+def _json_value(value):
+    if isinstance(value, (list, tuple, MultiValue)):
+        return [_json_value(item) for item in value]
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, bytes):
+        return None
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    return str(value)
+
+
+def dataset_to_tags(ds: Dataset, keywords: Optional[Iterable[str]] = None) -> Dict[str, object]:
+    """Top-level, non-binary, non-sequence elements as {keyword: JSON value}"""
+    wanted = set(keywords) if keywords is not None else None
+    tags = {}
+    for elem in ds:
+        if not elem.keyword or elem.VR in BINARY_VRS or elem.VR == "SQ":
+            continue
+        if wanted is not None and elem.keyword not in wanted:
+            continue
+        tags[elem.keyword] = _json_value(elem.value)
+    return tags
+
+
+def read_tags_from_file(path: str, keywords: List[str]) -> Dict[str, object]:
+    """Read only the given tags from the file header"""
+    ds = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=keywords)
+    found = dataset_to_tags(ds, keywords)
+    return {keyword: found.get(keyword) for keyword in keywords}
+
+
+class MetadataIndex:
+    """
+    DICOM tag index stored in ``dicom_tag_index`` with an in-memory LRU.
+
+    Tags are captured once at ingest, either all of them (``keywords`` is
+    None) or a configured subset, so metadata requests are served without
+    touching the file. Only tags outside the indexed subset require reading
+    the file header. Stored tags enter the LRU only once the session that
+    wrote them commits, so a rolled-back ingest is never served.
+    """
+
+    def __init__(self, keywords: Optional[Iterable[str]] = None, max_entries: int = 512):
+        self.keywords = set(keywords) if keywords else None
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def covers(self, keyword: str) -> bool:
+        """Whether the index would hold keyword if the file had it"""
+        return self.keywords is None or keyword in self.keywords
+
+    def store(self, db: Session, case_id: int, ds: Dataset) -> Dict[str, object]:
+        """Index a dataset for a case; the caller commits"""
+        tags = dataset_to_tags(ds, self.keywords)
+        db.merge(DicomTagIndex(case_id=case_id, tags=tags))
+        self.invalidate(case_id)
+        db.info.setdefault(_PENDING, {})[case_id] = tags
+        if not event.contains(db, "after_commit", self._after_commit):
+            event.listen(db, "after_commit", self._after_commit)
+            event.listen(db, "after_rollback", self._after_rollback)
+        return tags
+
+    def get(self, db: Session, case_id: int) -> Optional[Dict[str, object]]:
+        with self._lock:
+            tags = self._entries.get(case_id)
+            if tags is not None:
+                self._entries.move_to_end(case_id)
+                return tags
+
+        row = db.query(DicomTagIndex.tags).filter(DicomTagIndex.case_id == case_id).first()
+        if row is None:
+            return None
+        self._remember(case_id, row.tags)
+        return row.tags
+
+    def invalidate(self, case_id: int) -> None:
+        with self._lock:
+            self._entries.pop(case_id, None)
+
+    def _after_commit(self, session: Session) -> None:
+        for case_id, tags in session.info.pop(_PENDING, {}).items():
+            self._remember(case_id, tags)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_PENDING, None)
+
+    def _remember(self, case_id: int, tags: Dict[str, object]) -> None:
+        with self._lock:
+            self._entries[case_id] = tags
+            self._entries.move_to_end(case_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
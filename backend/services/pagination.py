@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the position just after a row"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_query(query, model, cursor: Optional[str], limit: int, descending: bool = True):
+    """
+    query (a Query or a select()) ordered by (created_at, id), starting
+    after cursor, with one row more than the page to detect the last page.
+
+    The position is a row-value comparison on the same columns as the sort,
+    so the database seeks straight to it through a (..., created_at, id)
+    index instead of scanning and discarding earlier pages.
+    """
+    key = tuple_(model.created_at, model.id)
+    if cursor:
+        position = tuple_(*decode_cursor(cursor))
+        query = query.filter(key < position if descending else key > position)
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+    return query.limit(limit + 1)
+
+
+def page_rows(rows, limit: int):
+    """(rows, next cursor or None on the last page) from a keyset_query result"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def keyset_page(query, model, cursor: Optional[str], limit: int, descending: bool = True):
+    """One page of a Query, see keyset_query"""
+    return page_rows(keyset_query(query, model, cursor, limit, descending).all(), limit)
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+
+class HasherBusy(Exception):
+    """Raised instead of queueing when the hashing pool is saturated"""
+
+
+class PasswordHasher:
+    """
+    Password hashing and verification off the event loop.
+
+    bcrypt releases the GIL while it works, so a small dedicated thread pool
+    runs ``workers`` hashes in parallel without touching the server's
+    default threadpool. At most ``max_queue`` further calls wait for a
+    worker; beyond that ``HasherBusy`` is raised straight away, so a login
+    storm is shed at the door instead of queueing up seconds of CPU. A slot
+    is held until its hash has actually finished, even when the request
+    waiting for it is cancelled.
+    """
+
+    def __init__(self, verify: Callable[[str, str], bool], hash: Callable[[str], str],
+                 workers: int = 2, max_queue: int = 16):
+        self._verify = verify
+        self._hash = hash
+        self.workers = workers
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                raise HasherBusy("Password hashing pool is saturated")
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(self._verify, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash, password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,247 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models.models import Case, Review, PredictionJob, JobStatus
+
+TERMINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+def job_to_dict(job: PredictionJob) -> dict:
+    return {
+        "id": job.id,
+        "case_id": job.case_id,
+        "status": job.status.value if job.status else None,
+        "prediction": job.prediction,
+        "confidence": job.confidence,
+        "heatmap_path": job.heatmap_path,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class PredictionJobQueue:
+    """
+    Database-backed queue of prediction jobs.
+
+    Jobs are rows in ``prediction_jobs``, so no external broker is needed and
+    queued work survives restarts: call ``resume()`` at startup to requeue
+    stale jobs and start the worker. Each API process runs one worker task
+    that claims jobs with a conditional UPDATE (so several processes can share
+    the table), sends them through ``predictor.predict`` concurrently so they
+    are micro-batched, and writes the results to the job, the case and the
+    case's reviews. Jobs left RUNNING for longer than ``stale_after`` seconds
+    (e.g. after a crash) are claimed again.
+    """
+
+    def __init__(self, session_factory, predictor, concurrency: int = 16,
+                 poll_interval: float = 2.0, stale_after: float = 600.0):
+        self.session_factory = session_factory
+        self.predictor = predictor
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._task = None
+        self._wakeup = None
+        self._changed = None
+
+    def enqueue(self, db: Session, case_id: int) -> PredictionJob:
+        """Create a queued job for a case and wake the worker"""
+        job = PredictionJob(case_id=case_id, status=JobStatus.QUEUED)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self.wake()
+        return job
+
+    def enqueue_many(self, db: Session, case_ids: List[int]) -> List[int]:
+        """Create queued jobs for several cases in one commit; returns the job ids"""
+        jobs = [PredictionJob(case_id=case_id, status=JobStatus.QUEUED) for case_id in case_ids]
+        db.add_all(jobs)
+        db.commit()
+        self.wake()
+        return [job.id for job in jobs]
+
+    def get(self, job_id: int) -> Optional[dict]:
+        db = self.session_factory()
+        try:
+            job = db.query(PredictionJob).filter(PredictionJob.id == job_id).first()
+            return job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def requeue_stale(self) -> int:
+        """Put jobs left RUNNING for longer than stale_after (a crashed or stopped process) back in the queue"""
+        db = self.session_factory()
+        try:
+            stale = datetime.utcnow() - timedelta(seconds=self.stale_after)
+            count = (
+                db.query(PredictionJob)
+                .filter(PredictionJob.status == JobStatus.RUNNING, PredictionJob.started_at < stale)
+                .update({"status": JobStatus.QUEUED, "started_at": None}, synchronize_session=False)
+            )
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    async def resume(self):
+        """Requeue stale jobs and start working through the queue, e.g. on app startup"""
+        await run_in_threadpool(self.requeue_stale)
+        self.start()
+        self._wakeup.set()
+
+    def start(self):
+        """Start the worker task on the running event loop if needed"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._changed = asyncio.Condition()
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    async def watch(self, job_id: int):
+        """
+        Yield the job each time its state changes until it finishes.
+        Changes made by this process are pushed immediately; jobs handled by
+        another process are picked up by polling every ``poll_interval``.
+        """
+        self.start()
+        last = None
+        while True:
+            job = await run_in_threadpool(self.get, job_id)
+            if job is None:
+                return
+            if job != last:
+                yield job
+                last = job
+            if job["status"] in (status.value for status in TERMINAL_STATUSES):
+                return
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _run(self):
+        while True:
+            try:
+                jobs = await run_in_threadpool(self._claim, self.concurrency)
+            except Exception as e:
+                # e.g. the database is unreachable; keep the worker alive and retry
+                print(f"Error claiming prediction jobs: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if not jobs:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._notify()
+            # A job whose failure can't even be recorded must not stop the others
+            results = await asyncio.gather(*(self._process(*job) for job in jobs), return_exceptions=True)
+            for (job_id, _, _), result in zip(jobs, results):
+                if isinstance(result, Exception):
+                    print(f"Error processing prediction job {job_id}: {str(result)}")
+
+    async def _process(self, job_id: int, case_id: int, image_path: Optional[str]):
+        try:
+            if not image_path:
+                raise ValueError("No image found for this case")
+            result = await self.predictor.predict(image_path)
+            if not result:
+                raise ValueError("Error making prediction")
+            await run_in_threadpool(self._complete, job_id, case_id, result)
+        except Exception as e:
+            await run_in_threadpool(self._fail, job_id, str(e))
+        await self._notify()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    def _claim(self, limit: int):
+        """Atomically move up to limit queued (or stale) jobs to RUNNING"""
+        db = self.session_factory()
+        try:
+            stale = datetime.utcnow() - timedelta(seconds=self.stale_after)
+            candidates = (
+                db.query(PredictionJob.id, PredictionJob.status, PredictionJob.started_at)
+                .filter(or_(
+                    PredictionJob.status == JobStatus.QUEUED,
+                    and_(PredictionJob.status == JobStatus.RUNNING, PredictionJob.started_at < stale)
+                ))
+                .order_by(PredictionJob.id)
+                .limit(limit)
+                .all()
+            )
+            claimed = []
+            for candidate in candidates:
+                updated = (
+                    db.query(PredictionJob)
+                    .filter(
+                        PredictionJob.id == candidate.id,
+                        PredictionJob.status == candidate.status,
+                        PredictionJob.started_at == candidate.started_at
+                    )
+                    .update({"status": JobStatus.RUNNING, "started_at": datetime.utcnow()},
+                            synchronize_session=False)
+                )
+                if updated:
+                    claimed.append(candidate.id)
+            db.commit()
+            if not claimed:
+                return []
+
+            rows = (
+                db.query(PredictionJob.id, PredictionJob.case_id, Case.image_path)
+                .outerjoin(Case, Case.id == PredictionJob.case_id)
+                .filter(PredictionJob.id.in_(claimed))
+                .all()
+            )
+            return [(row.id, row.case_id, row.image_path) for row in rows]
+        finally:
+            db.close()
+
+    def _complete(self, job_id: int, case_id: int, result: dict):
+        db = self.session_factory()
+        try:
+            ai_columns = {
+                "ai_prediction": result["label"],
+                "ai_confidence": result["confidence"],
+                "ai_heatmap_path": result["heatmap"]
+            }
+            db.query(PredictionJob).filter(PredictionJob.id == job_id).update({
+                "status": JobStatus.COMPLETED,
+                "prediction": result["label"],
+                "confidence": result["confidence"],
+                "heatmap_path": result["heatmap"],
+                "finished_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.query(Case).filter(Case.id == case_id).update(ai_columns, synchronize_session=False)
+            db.query(Review).filter(Review.case_id == case_id).update(ai_columns, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _fail(self, job_id: int, error: str):
+        db = self.session_factory()
+        try:
+            db.query(PredictionJob).filter(PredictionJob.id == job_id).update({
+                "status": JobStatus.FAILED,
+                "error": error,
+                "finished_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pydicom
+from PIL import Image
+from pydicom.pixel_data_handlers.util import apply_modality_lut, apply_voi_lut
+
+from ai_model.dicom_loader import is_dicom
+
+# Longest edge of each pyramid level in pixels; None keeps the source size
+LEVELS = OrderedDict([("thumb", 256), ("screen", 1280), ("full", None)])
+FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+    "webp": ("WEBP", "image/webp", ".webp"),
+}
+
+
+def _decode_dicom(path: str) -> Image.Image:
+    """Window a DICOM image (middle frame) to 8-bit grayscale"""
+    ds = pydicom.dcmread(path)
+    pixels = ds.pixel_array
+    if ds.get("SamplesPerPixel", 1) != 1:
+        frame = pixels[len(pixels) // 2] if pixels.ndim == 4 else pixels
+        return Image.fromarray(frame.astype(np.uint8), mode="RGB")
+    if pixels.ndim == 3:
+        pixels = pixels[len(pixels) // 2]
+
+    pixels = apply_modality_lut(pixels, ds)
+    if "WindowCenter" in ds or "VOILUTSequence" in ds:
+        pixels = apply_voi_lut(pixels, ds)
+    pixels = pixels.astype(np.float32)
+    low, high = pixels.min(), pixels.max()
+    pixels = (pixels - low) / (high - low) if high > low else np.zeros_like(pixels)
+    if ds.get("PhotometricInterpretation") == "MONOCHROME1":
+        pixels = 1.0 - pixels
+    return Image.fromarray((pixels * 255.0).round().astype(np.uint8), mode="L")
+
+
+def decode_image(path: str) -> Image.Image:
+    """Open an image or DICOM file as an 8-bit L or RGB image"""
+    if is_dicom(path):
+        return _decode_dicom(path)
+    image = Image.open(path)
+    image.load()
+    return image if image.mode in ("L", "RGB") else image.convert("RGB")
+
+
+class PreviewService:
+    """
+    Downsampled previews of stored images and DICOM files.
+
+    Each source is decoded once and rendered to every level in ``LEVELS``
+    (thumbnail, screen-size and full resolution). Renders are cached on disk
+    under ``cache_dir`` keyed by the source path, size and mtime, so a
+    replaced file gets new previews. When the cache grows past
+    ``max_cache_bytes`` the least recently served renders are removed.
+    """
+
+    def __init__(self, cache_dir: str = "static/previews", max_cache_bytes: int = 512 * 1024 * 1024,
+                 quality: int = 85):
+        self.cache_dir = Path(cache_dir)
+        self.max_cache_bytes = max_cache_bytes
+        self.quality = quality
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self._cache_bytes = None
+
+    @staticmethod
+    def level_for(width: Optional[int]) -> str:
+        """Smallest level that covers a viewport of the given width"""
+        if width is None:
+            return "screen"
+        for level, size in LEVELS.items():
+            if size is None or size >= width:
+                return level
+        return "full"
+
+    def _key(self, source_path: str) -> str:
+        stat = os.stat(source_path)
+        ident = f"{os.path.realpath(source_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    def _path(self, key: str, level: str, fmt: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}_{level}{FORMATS[fmt][2]}"
+
+    def get(self, source_path: str, level: str = "screen", fmt: str = "jpeg") -> Path:
+        """Path of a rendered level, rendering the pyramid on first request"""
+        key = self._key(source_path)
+        path = self._path(key, level, fmt)
+        if path.exists():
+            os.utime(path)
+            return path
+        return self.render_pyramid(source_path, formats=(fmt,))[level]
+
+    def render_pyramid(self, source_path: str, formats: Iterable[str] = ("jpeg",)) -> Dict[str, Path]:
+        """Render every level of a source in the given formats; returns the paths of the first format"""
+        formats = list(formats)
+        key = self._key(source_path)
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+
+        with render_lock:
+            paths = {level: self._path(key, level, formats[0]) for level in LEVELS}
+            missing = [
+                (level, fmt) for fmt in formats for level in LEVELS
+                if not self._path(key, level, fmt).exists()
+            ]
+            if missing:
+                image = decode_image(source_path)
+                written = 0
+                for level, fmt in missing:
+                    written += self._save(image, key, level, fmt)
+                self._account(written, keep=key)
+
+        with self._lock:
+            self._render_locks.pop(key, None)
+        return paths
+
+    def _save(self, image: Image.Image, key: str, level: str, fmt: str) -> int:
+        size = LEVELS[level]
+        rendered = image
+        if size is not None and max(image.size) > size:
+            rendered = image.copy()
+            rendered.thumbnail((size, size), Image.LANCZOS)
+
+        path = self._path(key, level, fmt)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = path.with_name(path.name + ".part")
+        rendered.save(partial_path, format=FORMATS[fmt][0], quality=self.quality)
+        os.replace(partial_path, path)
+        return path.stat().st_size
+
+    def _scan(self):
+        suffixes = {suffix for _, _, suffix in FORMATS.values()}
+        return [path for path in self.cache_dir.glob("*/*") if path.suffix in suffixes]
+
+    def _account(self, written: int, keep: str) -> None:
+        with self._lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(path.stat().st_size for path in self._scan())
+            else:
+                self._cache_bytes += written
+            if self._cache_bytes > self.max_cache_bytes:
+                self._evict(keep)
+
+    def _evict(self, keep: str) -> None:
+        """Drop least recently served renders down to 90% of the budget, sparing the keep source"""
+        entries = []
+        for path in self._scan():
+            if path.name.startswith(keep):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        kept = sum(path.stat().st_size for path in self._scan() if path.name.startswith(keep))
+        total = kept + sum(size for _, size, _ in entries)
+        target = self.max_cache_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except FileNotFoundError:
+                pass
+        self._cache_bytes = total
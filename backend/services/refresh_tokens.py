@@ -0,0 +1,98 @@
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+
+from models.models import RefreshToken
+
+
+class InvalidRefreshToken(Exception):
+    """The refresh token is malformed, expired, revoked or already used"""
+
+
+class RefreshTokenStore:
+    """
+    Rotating refresh tokens.
+
+    A refresh token is a signed JWT naming a row in ``refresh_tokens``.
+    Presenting it to ``rotate`` marks the row used and issues its successor
+    in the same family, so checking a token costs one indexed update and no
+    password hash. Presenting a used token again means it was copied, and
+    revokes the whole family. Expired rows are deleted at most every
+    ``prune_interval`` seconds as new tokens are issued.
+    """
+
+    def __init__(self, secret_key: str, algorithm: str, lifetime: timedelta, prune_interval: float = 3600.0):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.lifetime = lifetime
+        self.prune_interval = prune_interval
+        self._lock = threading.Lock()
+        self._pruned_at = None
+
+    def issue(self, db: Session, user_id: int, username: str, family: Optional[str] = None) -> str:
+        """Store and return a new refresh token, starting a new family unless one is given"""
+        jti = secrets.token_hex(16)
+        family = family or secrets.token_hex(16)
+        expires_at = datetime.utcnow() + self.lifetime
+        db.add(RefreshToken(jti=jti, family=family, user_id=user_id, expires_at=expires_at))
+        self._maybe_prune(db)
+        db.commit()
+        return jwt.encode(
+            {"sub": username, "jti": jti, "fam": family, "type": "refresh", "exp": expires_at},
+            self.secret_key, algorithm=self.algorithm
+        )
+
+    def _claims(self, token: str) -> dict:
+        try:
+            claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except JWTError:
+            raise InvalidRefreshToken("Invalid refresh token")
+        if claims.get("type") != "refresh" or not claims.get("jti") or not claims.get("fam"):
+            raise InvalidRefreshToken("Invalid refresh token")
+        return claims
+
+    def rotate(self, db: Session, token: str) -> Tuple[int, str]:
+        """Spend a refresh token; returns (user id, the next refresh token)"""
+        claims = self._claims(token)
+        # Conditional update, so of two concurrent refreshes with one token only one wins
+        spent = db.query(RefreshToken).filter(
+            RefreshToken.jti == claims["jti"], RefreshToken.used.is_(False)
+        ).update({"used": True}, synchronize_session=False)
+        if not spent:
+            self.revoke_family(db, claims["fam"])
+            raise InvalidRefreshToken("Refresh token was revoked or already used")
+
+        row = db.query(RefreshToken).filter(RefreshToken.jti == claims["jti"]).first()
+        return row.user_id, self.issue(db, row.user_id, claims["sub"], family=row.family)
+
+    def revoke(self, db: Session, token: str) -> None:
+        """Revoke a token and every token rotated from the same login"""
+        self.revoke_family(db, self._claims(token)["fam"])
+
+    def revoke_family(self, db: Session, family: str) -> None:
+        db.query(RefreshToken).filter(RefreshToken.family == family).delete(synchronize_session=False)
+        db.commit()
+
+    def revoke_user(self, db: Session, user_id: int) -> None:
+        """Sign a user out everywhere, e.g. after a password change or deactivation"""
+        db.query(RefreshToken).filter(RefreshToken.user_id == user_id).delete(synchronize_session=False)
+        db.commit()
+
+    def prune(self, db: Session) -> int:
+        """Delete expired tokens; the caller commits"""
+        return db.query(RefreshToken).filter(
+            RefreshToken.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+
+    def _maybe_prune(self, db: Session) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._pruned_at is not None and now - self._pruned_at < self.prune_interval:
+                return
+            self._pruned_at = now
+        self.prune(db)
@@ -0,0 +1,192 @@
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+from sqlalchemy import func
+
+from models.models import Case, ReportJob, JobStatus
+from services.search import search_index
+
+
+def extract_text(pdf_path: str, last_page: int) -> str:
+    """Text layer of the first last_page pages, via poppler's pdftotext"""
+    result = subprocess.run(
+        ["pdftotext", "-f", "1", "-l", str(last_page), "-enc", "UTF-8", pdf_path, "-"],
+        capture_output=True, check=True, timeout=120
+    )
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def render_page(pdf_path: str, page: int, output_path: str, dpi: int, max_edge: Optional[int],
+                quality: int = 85) -> str:
+    """
+    Rasterize one PDF page straight to a JPEG file. pdftoppm writes the
+    file itself, so the page is only loaded back when it needs shrinking.
+    """
+    work_dir = tempfile.mkdtemp(dir=os.path.dirname(output_path) or ".")
+    try:
+        rendered = convert_from_path(
+            pdf_path, dpi=dpi, first_page=page, last_page=page,
+            output_folder=work_dir, fmt="jpeg", paths_only=True, jpegopt={"quality": quality}
+        )
+        if not rendered:
+            raise ValueError(f"Page {page} could not be rendered")
+        if max_edge:
+            with Image.open(rendered[0]) as image:
+                if max(image.size) > max_edge:
+                    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+                    image.save(rendered[0], "JPEG", quality=quality)
+        os.replace(rendered[0], output_path)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class ReportRasterizer:
+    """
+    Background rasterization of uploaded PDF reports.
+
+    ``enqueue`` returns immediately; a coordinator thread per job feeds the
+    pages one at a time to a shared process pool, keeping at most
+    ``max_inflight_pages`` pages in flight, so memory stays flat whatever
+    the page count. Pages are rendered at ``dpi``, shrunk to ``max_edge``
+    pixels on the longest side, and only the first ``max_pages`` pages are
+    rendered. Progress and the results are written to the ``report_jobs``
+    row and, once complete, to the case; the report's text is added to the
+    search index. The rendering itself lives in this process, so ``resume``
+    restarts the jobs a previous process left unfinished.
+    """
+
+    def __init__(self, session_factory, output_dir: str = "static/uploads/reports", workers: int = 2,
+                 max_concurrent_jobs: int = 2, max_inflight_pages: Optional[int] = None, dpi: int = 150,
+                 max_edge: Optional[int] = 2048, max_pages: int = 100):
+        self.session_factory = session_factory
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_inflight_pages = max_inflight_pages or workers * 2
+        self.dpi = dpi
+        self.max_edge = max_edge
+        self.max_pages = max_pages
+        self._lock = threading.Lock()
+        self._pool = None
+        self._coordinator = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="report-raster")
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # Spawned workers don't inherit the API process's threads and sockets
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def enqueue(self, db, case_id: int, report_path: str) -> ReportJob:
+        """Create a queued job for a saved PDF and start it in the background"""
+        job = ReportJob(case_id=case_id, status=JobStatus.QUEUED, report_path=report_path)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        self._coordinator.submit(self._run, job.id, case_id, report_path)
+        return job
+
+    def resume(self, stale_after: float = 0.0) -> int:
+        """
+        Restart queued and running jobs older than stale_after seconds, e.g.
+        on app startup, and return how many were restarted. Each job is
+        claimed with a conditional update, so when several processes start
+        together only one of them picks it up.
+        """
+        db = self.session_factory()
+        try:
+            cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+            unfinished = db.query(ReportJob).filter(
+                ReportJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+                func.coalesce(ReportJob.started_at, ReportJob.created_at) <= cutoff
+            ).all()
+            resumed = 0
+            for job in unfinished:
+                started_at = ReportJob.started_at.is_(None) if job.started_at is None \
+                    else ReportJob.started_at == job.started_at
+                claimed = db.query(ReportJob).filter(
+                    ReportJob.id == job.id, ReportJob.status == job.status, started_at
+                ).update({"status": JobStatus.QUEUED, "started_at": datetime.utcnow(), "pages_done": 0},
+                         synchronize_session=False)
+                db.commit()
+                if claimed:
+                    self._coordinator.submit(self._run, job.id, job.case_id, job.report_path)
+                    resumed += 1
+            return resumed
+        finally:
+            db.close()
+
+    def pages(self, report_path: str, page_count: int) -> Iterator[str]:
+        """Render pages in order, yielding each output path as it completes"""
+        pool = self._get_pool()
+        stem = os.path.splitext(os.path.basename(report_path))[0]
+        inflight = deque()
+        for page in range(1, page_count + 1):
+            output_path = os.path.join(self.output_dir, f"{stem}_page_{page}.jpg")
+            inflight.append(pool.submit(render_page, report_path, page, output_path, self.dpi, self.max_edge))
+            if len(inflight) >= self.max_inflight_pages:
+                yield inflight.popleft().result()
+        while inflight:
+            yield inflight.popleft().result()
+
+    def _run(self, job_id: int, case_id: int, report_path: str):
+        try:
+            total_pages = int(pdfinfo_from_path(report_path)["Pages"])
+            page_count = min(total_pages, self.max_pages)
+            self._update(job_id, status=JobStatus.RUNNING, started_at=datetime.utcnow(), page_count=page_count)
+
+            image_paths = []
+            for image_path in self.pages(report_path, page_count):
+                image_paths.append(image_path)
+                self._update(job_id, pages_done=len(image_paths))
+
+            try:
+                report_text = extract_text(report_path, page_count)
+            except Exception as e:
+                print(f"Error extracting text from {report_path}: {str(e)}")
+                report_text = ""
+
+            db = self.session_factory()
+            try:
+                db.query(ReportJob).filter(ReportJob.id == job_id).update({
+                    "status": JobStatus.COMPLETED,
+                    "image_paths": image_paths,
+                    "error": f"Only the first {page_count} of {total_pages} pages were rendered"
+                    if page_count < total_pages else None,
+                    "finished_at": datetime.utcnow()
+                }, synchronize_session=False)
+                db.query(Case).filter(Case.id == case_id).update(
+                    {"report_path": report_path, "report_images": image_paths}, synchronize_session=False
+                )
+                search_index.upsert(db.connection(), "report", case_id, case_id, report_text)
+                db.commit()
+            finally:
+                db.close()
+        except Exception as e:
+            self._update(job_id, status=JobStatus.FAILED, error=str(e), finished_at=datetime.utcnow())
+
+    def _update(self, job_id: int, **values):
+        db = self.session_factory()
+        try:
+            db.query(ReportJob).filter(ReportJob.id == job_id).update(values, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def shutdown(self):
+        self._coordinator.shutdown(wait=False)
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
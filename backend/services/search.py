@@ -0,0 +1,251 @@
+import html
+import re
+import threading
+from typing import Iterable, List, Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from models.models import Case, Review
+
+# Document types and the model columns whose text they index
+REVIEW_FIELDS = ("findings", "recommendations", "diagnosis", "feedback")
+CASE_FIELDS = ("notes",)
+DOC_TYPES = ("review", "case", "report")
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Private-use characters mark matches in snippets until the text is escaped
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+_MARKERS = re.compile(f"[{_MATCH_START}{_MATCH_END}]")
+
+
+def _body(obj, fields) -> str:
+    return "\n".join(str(value) for value in (getattr(obj, field, None) for field in fields) if value)
+
+
+def _highlight(snippet: str) -> str:
+    """HTML-escape a snippet and turn its match markers into <b> tags"""
+    return html.escape(snippet).replace(_MATCH_START, "<b>").replace(_MATCH_END, "</b>")
+
+
+def _fts5_query(query: str) -> Optional[str]:
+    """Quote each term so user input never hits FTS5 syntax; the last term matches as a prefix"""
+    terms = _TOKEN.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class SearchIndex:
+    """
+    Full-text index over review text, case notes and report text.
+
+    Uses an FTS5 virtual table on SQLite and a ``tsvector`` column with a
+    GIN index on PostgreSQL, picked from the session's engine. After
+    ``listen()``, every ORM flush that creates, changes or deletes a Case or
+    Review updates its document in the same transaction, so the index never
+    needs a rebuild; report text is added with ``upsert`` once it has been
+    extracted, and removed with its case. On SQLite a plain table maps each
+    document to its FTS5 rowid, so updates and deletes touch one row rather
+    than scanning the index. Snippets are HTML-escaped, with matches in
+    ``<b>`` tags.
+    """
+
+    def __init__(self, language: str = "english"):
+        self.language = language
+        self._lock = threading.Lock()
+        self._ready = set()
+
+    def listen(self) -> None:
+        if not event.contains(Session, "after_flush", self._after_flush):
+            event.listen(Session, "after_flush", self._after_flush)
+
+    def create(self, connection) -> None:
+        """Create the index table for the connection's database if needed"""
+        key = str(connection.engine.url)
+        with self._lock:
+            if key in self._ready:
+                return
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                "CREATE TABLE IF NOT EXISTS search_documents ("
+                " doc_type VARCHAR(16) NOT NULL,"
+                " doc_id INTEGER NOT NULL,"
+                " case_id INTEGER,"
+                " body TEXT NOT NULL,"
+                f" tsv tsvector GENERATED ALWAYS AS (to_tsvector('{self.language}', body)) STORED,"
+                " PRIMARY KEY (doc_type, doc_id))"
+            ))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)"
+            ))
+        else:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents USING fts5("
+                " doc_type UNINDEXED, doc_id UNINDEXED, case_id UNINDEXED, body,"
+                " tokenize = 'porter unicode61')"
+            ))
+            mapped = connection.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_document_rows'"
+            )).first()
+            if mapped is None:
+                connection.execute(text(
+                    "CREATE TABLE search_document_rows ("
+                    " id INTEGER PRIMARY KEY,"
+                    " doc_type VARCHAR(16) NOT NULL,"
+                    " doc_id INTEGER NOT NULL,"
+                    " UNIQUE (doc_type, doc_id))"
+                ))
+                # Map the documents of an index created before the table existed
+                connection.execute(text(
+                    "INSERT OR IGNORE INTO search_document_rows (id, doc_type, doc_id)"
+                    " SELECT rowid, doc_type, doc_id FROM search_documents"
+                ))
+        with self._lock:
+            self._ready.add(key)
+
+    def upsert(self, connection, doc_type: str, doc_id: int, case_id: Optional[int], body: str) -> None:
+        self.create(connection)
+        if not body:
+            self.delete(connection, doc_type, doc_id)
+            return
+        body = _MARKERS.sub("", body)
+        params = {"doc_type": doc_type, "doc_id": doc_id, "case_id": case_id, "body": body}
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                "INSERT INTO search_documents (doc_type, doc_id, case_id, body)"
+                " VALUES (:doc_type, :doc_id, :case_id, :body)"
+                " ON CONFLICT (doc_type, doc_id) DO UPDATE SET case_id = EXCLUDED.case_id, body = EXCLUDED.body"
+            ), params)
+        else:
+            # FTS5 tables have no unique constraints to upsert against, so
+            # the document's rowid comes from search_document_rows
+            connection.execute(text(
+                "INSERT OR IGNORE INTO search_document_rows (doc_type, doc_id) VALUES (:doc_type, :doc_id)"
+            ), params)
+            params["rowid"] = self._rowid(connection, doc_type, doc_id)
+            connection.execute(text("DELETE FROM search_documents WHERE rowid = :rowid"), params)
+            connection.execute(text(
+                "INSERT INTO search_documents (rowid, doc_type, doc_id, case_id, body)"
+                " VALUES (:rowid, :doc_type, :doc_id, :case_id, :body)"
+            ), params)
+
+    def delete(self, connection, doc_type: str, doc_id: int) -> None:
+        self.create(connection)
+        if connection.dialect.name == "postgresql":
+            connection.execute(
+                text("DELETE FROM search_documents WHERE doc_type = :doc_type AND doc_id = :doc_id"),
+                {"doc_type": doc_type, "doc_id": doc_id}
+            )
+            return
+        rowid = self._rowid(connection, doc_type, doc_id)
+        if rowid is None:
+            return
+        connection.execute(text("DELETE FROM search_documents WHERE rowid = :rowid"), {"rowid": rowid})
+        connection.execute(text("DELETE FROM search_document_rows WHERE id = :rowid"), {"rowid": rowid})
+
+    def _rowid(self, connection, doc_type: str, doc_id: int) -> Optional[int]:
+        return connection.execute(
+            text("SELECT id FROM search_document_rows WHERE doc_type = :doc_type AND doc_id = :doc_id"),
+            {"doc_type": doc_type, "doc_id": doc_id}
+        ).scalar()
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        changes = []
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Review):
+                doc = ("review", obj.id, obj.case_id, REVIEW_FIELDS)
+            elif isinstance(obj, Case):
+                doc = ("case", obj.id, obj.id, CASE_FIELDS)
+            else:
+                continue
+            state = inspect(obj)
+            if obj in session.new or any(state.attrs[field].history.has_changes() for field in doc[3]):
+                changes.append((doc, obj))
+
+        deleted = []
+        for obj in session.deleted:
+            if isinstance(obj, Review):
+                deleted.append(("review", obj.id))
+            elif isinstance(obj, Case):
+                # The report document is keyed by its case
+                deleted.extend([("case", obj.id), ("report", obj.id)])
+        if not changes and not deleted:
+            return
+
+        connection = session.connection()
+        for (doc_type, doc_id, case_id, fields), obj in changes:
+            self.upsert(connection, doc_type, doc_id, case_id, _body(obj, fields))
+        for doc_type, doc_id in deleted:
+            self.delete(connection, doc_type, doc_id)
+
+    def rebuild(self, db: Session) -> int:
+        """Index every existing case and review (e.g. after enabling search on an existing database)"""
+        connection = db.connection()
+        count = 0
+        for review in db.query(Review).yield_per(500):
+            self.upsert(connection, "review", review.id, review.case_id, _body(review, REVIEW_FIELDS))
+            count += 1
+        for case in db.query(Case).yield_per(500):
+            self.upsert(connection, "case", case.id, case.id, _body(case, CASE_FIELDS))
+            count += 1
+        db.commit()
+        return count
+
+    def search(self, db: Session, query: str, doc_types: Optional[Iterable[str]] = None,
+               limit: int = 20, offset: int = 0) -> List[dict]:
+        """Best matches first, each with a highlighted snippet"""
+        connection = db.connection()
+        self.create(connection)
+        doc_types = list(doc_types or DOC_TYPES)
+        params = {"limit": limit, "offset": offset}
+        type_params = {f"type_{i}": doc_type for i, doc_type in enumerate(doc_types)}
+        params.update(type_params)
+        type_filter = f"doc_type IN ({', '.join(':' + name for name in type_params)})"
+
+        if connection.dialect.name == "postgresql":
+            params.update({
+                "query": query,
+                "language": self.language,
+                "headline": f"MaxFragments=2, MaxWords=24, StartSel={_MATCH_START}, StopSel={_MATCH_END}",
+            })
+            sql = (
+                "SELECT doc_type, doc_id, case_id,"
+                " ts_headline(CAST(:language AS regconfig), body, q, :headline) AS snippet,"
+                " ts_rank_cd(tsv, q) AS rank"
+                " FROM search_documents, websearch_to_tsquery(CAST(:language AS regconfig), :query) AS q"
+                f" WHERE tsv @@ q AND {type_filter}"
+                " ORDER BY rank DESC, doc_id DESC LIMIT :limit OFFSET :offset"
+            )
+        else:
+            match = _fts5_query(query)
+            if match is None:
+                return []
+            params.update({"query": match, "start": _MATCH_START, "end": _MATCH_END})
+            # bm25() is lower for better matches
+            sql = (
+                "SELECT doc_type, doc_id, case_id,"
+                " snippet(search_documents, 3, :start, :end, '...', 24) AS snippet,"
+                " -bm25(search_documents) AS rank"
+                " FROM search_documents"
+                f" WHERE search_documents MATCH :query AND {type_filter}"
+                " ORDER BY bm25(search_documents) LIMIT :limit OFFSET :offset"
+            )
+
+        return [
+            {
+                "type": row.doc_type,
+                "id": int(row.doc_id),
+                "case_id": int(row.case_id) if row.case_id is not None else None,
+                "snippet": _highlight(row.snippet or ""),
+                "rank": float(row.rank),
+            }
+            for row in connection.execute(text(sql), params)
+        ]
+
+
+search_index = SearchIndex()
@@ -1,69 +1,255 @@
 import os
-import shutil
-from datetime import datetime
+import re
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import uuid
+from decouple import config
 from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 from typing import Optional
 
+from services.uploads import stream_upload
+
+# Content-addressed keys look like objects/ab/cd/<sha256><suffix>
+OBJECT_PREFIX = "objects"
+# Top-level directories of keys handed out by the save methods, including
+# the per-kind directories used before content addressing
+SERVABLE_PREFIXES = (OBJECT_PREFIX, "images", "reports", "heatmaps")
+
+
+def content_key(sha256: str, suffix: str = "") -> str:
+    """Storage key for a blob: its SHA-256 sharded two levels deep"""
+    return f"{OBJECT_PREFIX}/{sha256[:2]}/{sha256[2:4]}/{sha256}{suffix}"
+
+
+def _clean_suffix(filename: Optional[str]) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,10}", suffix) else ""
+
+
+class StorageBackend(ABC):
+    """Where content-addressed blobs live. Keys are relative POSIX paths."""
+
+    # The directory local_path() returns files from
+    root: Path
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def put(self, source_path: str, key: str) -> None:
+        """Store the file at source_path under key, consuming source_path"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def local_path(self, key: str) -> Optional[Path]:
+        """A local file with the blob's contents, or None if it is missing"""
+
+
+class LocalBackend(StorageBackend):
+    """Blobs as files under root, so the /static mount can serve them directly"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def put(self, source_path: str, key: str) -> None:
+        target = self.root / key
+        if target.exists():
+            os.remove(source_path)
+            return
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source_path, target)
+
+    def delete(self, key: str) -> None:
+        try:
+            (self.root / key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self.root / key
+        return path if path.exists() else None
+
+
+class S3Backend(StorageBackend):
+    """
+    Blobs in an S3-compatible bucket (e.g. a local MinIO). Reads are served
+    from copies downloaded to cache_dir. Requires boto3.
+    """
+
+    def __init__(self, bucket: str, cache_dir: Path, endpoint_url: Optional[str] = None, prefix: str = ""):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError as e:
+            raise RuntimeError("The S3 storage backend requires boto3") from e
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix
+        self.cache_dir = Path(cache_dir)
+        self.root = self.cache_dir
+
+    def _object_name(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._object_name(key))
+            return True
+        except self._client_error:
+            return False
+
+    def put(self, source_path: str, key: str) -> None:
+        try:
+            if not self.exists(key):
+                self._client.upload_file(source_path, self.bucket, self._object_name(key))
+        finally:
+            os.remove(source_path)
+
+    def delete(self, key: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self._object_name(key))
+        try:
+            (self.cache_dir / key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[Path]:
+        path = self.cache_dir / key
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+        try:
+            self._client.download_file(self.bucket, self._object_name(key), str(partial_path))
+        except self._client_error:
+            return None
+        os.replace(partial_path, path)
+        return path
+
+
 class StorageService:
-    def __init__(self):
-        self.base_dir = Path("static/uploads")
-        self.image_dir = self.base_dir / "images"
-        self.report_dir = self.base_dir / "reports"
-        self.heatmap_dir = self.base_dir / "heatmaps"
-        
-        # Create directories if they don't exist
-        self.image_dir.mkdir(parents=True, exist_ok=True)
-        self.report_dir.mkdir(parents=True, exist_ok=True)
-        self.heatmap_dir.mkdir(parents=True, exist_ok=True)
+    """
+    Content-addressed file storage.
 
-    async def save_image(self, file: UploadFile, case_id: str) -> str:
-        """Save an uploaded image and return its path"""
+    Uploads are hashed while they stream to disk and stored once under their
+    SHA-256 (``objects/ab/cd/<sha256><suffix>``), so re-uploads of the same
+    file share one blob and no directory grows past a few hundred entries.
+    Each save takes a reference, counted in the SQLite file at
+    ``refs_path``; ``delete_file`` drops a reference and removes the blob
+    with the last one. The reference file lists every key, so it must live
+    outside any directory served without authentication. The blobs themselves go to a ``StorageBackend``: the local
+    filesystem by default, or an S3-compatible bucket.
+
+    Paths saved before content addressing (``images/...`` etc.) are still
+    resolved and deleted as plain files.
+    """
+
+    def __init__(self, base_dir: str = "static/uploads", backend: Optional[StorageBackend] = None,
+                 refs_path: str = "storage_refs.db"):
+        self.base_dir = Path(base_dir)
+        self.tmp_dir = self.base_dir / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.backend = backend or LocalBackend(self.base_dir)
+
+        refs_path = Path(refs_path)
+        refs_path.parent.mkdir(parents=True, exist_ok=True)
+        # Earlier versions kept the counts inside the served uploads directory
+        legacy_refs = self.base_dir / "refs.db"
+        if legacy_refs.exists() and not refs_path.exists():
+            os.replace(legacy_refs, refs_path)
+        self._lock = threading.Lock()
+        self._refs = sqlite3.connect(str(refs_path), check_same_thread=False,
+                                     isolation_level=None, timeout=30)
+        self._refs.execute("CREATE TABLE IF NOT EXISTS refs (key TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+
+    async def _save(self, file: UploadFile) -> str:
+        tmp_path = str(self.tmp_dir / uuid.uuid4().hex)
         try:
-            # Generate unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{case_id}_{timestamp}{Path(file.filename).suffix}"
-            file_path = self.image_dir / filename
+            stored = await stream_upload(file, tmp_path)
+            key = content_key(stored.sha256, _clean_suffix(file.filename))
+            await run_in_threadpool(self._add_reference, stored.path, key)
+            return key
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _add_reference(self, source_path: str, key: str) -> None:
+        # The blob write and the refcount change happen in one write
+        # transaction, so a concurrent delete cannot remove a blob in between
+        with self._lock:
+            self._refs.execute("BEGIN IMMEDIATE")
+            try:
+                self.backend.put(source_path, key)
+                self._refs.execute(
+                    "INSERT INTO refs (key, count) VALUES (?, 1) "
+                    "ON CONFLICT(key) DO UPDATE SET count = count + 1",
+                    (key,)
+                )
+                self._refs.execute("COMMIT")
+            except BaseException:
+                self._refs.execute("ROLLBACK")
+                raise
+
+    def _drop_reference(self, key: str) -> bool:
+        with self._lock:
+            self._refs.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._refs.execute("SELECT count FROM refs WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self._refs.execute("COMMIT")
+                    return False
+                if row[0] > 1:
+                    self._refs.execute("UPDATE refs SET count = count - 1 WHERE key = ?", (key,))
+                else:
+                    self._refs.execute("DELETE FROM refs WHERE key = ?", (key,))
+                    self.backend.delete(key)
+                self._refs.execute("COMMIT")
+                return True
+            except BaseException:
+                self._refs.execute("ROLLBACK")
+                raise
 
-            # Save file
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+    def reference_count(self, key: str) -> int:
+        with self._lock:
+            row = self._refs.execute("SELECT count FROM refs WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
 
-            return str(file_path.relative_to(self.base_dir))
+    async def save_image(self, file: UploadFile, case_id: str) -> str:
+        """Save an uploaded image and return its path"""
+        try:
+            return await self._save(file)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error saving image: {str(e)}")
 
     async def save_report(self, file: UploadFile, case_id: str) -> str:
         """Save a report file and return its path"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{case_id}_{timestamp}{Path(file.filename).suffix}"
-            file_path = self.report_dir / filename
-
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            return str(file_path.relative_to(self.base_dir))
+            return await self._save(file)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error saving report: {str(e)}")
 
     async def save_heatmap(self, file: UploadFile, case_id: str) -> str:
         """Save a heatmap image and return its path"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{case_id}_{timestamp}{Path(file.filename).suffix}"
-            file_path = self.heatmap_dir / filename
-
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-
-            return str(file_path.relative_to(self.base_dir))
+            return await self._save(file)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error saving heatmap: {str(e)}")
 
     def get_file_path(self, relative_path: str) -> Optional[Path]:
         """Get the full path of a file from its relative path"""
         try:
+            if relative_path.startswith(f"{OBJECT_PREFIX}/"):
+                return self.backend.local_path(relative_path)
             file_path = self.base_dir / relative_path
             if file_path.exists():
                 return file_path
@@ -71,13 +257,50 @@ class StorageService:
         except Exception:
             return None
 
+    def servable_path(self, key: str) -> Optional[Path]:
+        """
+        The file behind a key handed out by a save method, or None for any
+        other path: absolute or parent paths, the reference database,
+        staging files, and anything resolving outside the store.
+        """
+        parts = key.split("/")
+        if "\\" in key or any(part in ("", ".", "..") for part in parts):
+            return None
+        if len(parts) < 2 or parts[0] not in SERVABLE_PREFIXES:
+            return None
+        path = self.get_file_path(key)
+        if path is None:
+            return None
+        root = self.backend.root if parts[0] == OBJECT_PREFIX else self.base_dir
+        resolved = path.resolve()
+        if not resolved.is_relative_to(root.resolve()) or not resolved.is_file():
+            return None
+        return resolved
+
     def delete_file(self, relative_path: str) -> bool:
         """Delete a file given its relative path"""
         try:
+            if relative_path.startswith(f"{OBJECT_PREFIX}/"):
+                return self._drop_reference(relative_path)
             file_path = self.base_dir / relative_path
             if file_path.exists():
                 file_path.unlink()
                 return True
             return False
         except Exception:
-            return False 
\ No newline at end of file
+            return False
+
+
+def storage_from_config() -> StorageService:
+    """StorageService with the backend selected by STORAGE_BACKEND (local or s3)"""
+    base_dir = config('STORAGE_DIR', default='static/uploads')
+    refs_path = config('STORAGE_REFS_PATH', default='storage_refs.db')
+    if config('STORAGE_BACKEND', default='local') == 's3':
+        backend = S3Backend(
+            config('STORAGE_S3_BUCKET'),
+            cache_dir=Path(base_dir) / "s3-cache",
+            endpoint_url=config('STORAGE_S3_ENDPOINT_URL', default=None),
+            prefix=config('STORAGE_S3_PREFIX', default='')
+        )
+        return StorageService(base_dir, backend=backend, refs_path=refs_path)
+    return StorageService(base_dir, refs_path=refs_path)
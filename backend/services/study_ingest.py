@@ -0,0 +1,167 @@
+import hashlib
+import os
+import re
+import tarfile
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pydicom
+from pydicom.dataset import Dataset
+
+from services.uploads import CHUNK_SIZE
+
+
+def _safe_name(name: str) -> Optional[str]:
+    """Flatten an archive member name, refusing absolute and parent paths"""
+    parts = [part for part in re.split(r"[\\/]+", name) if part not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    return "_".join(parts)
+
+
+class ArchiveTooLarge(ValueError):
+    """An upload unpacks to more members or bytes than allowed"""
+
+
+class ExtractionBudget:
+    """
+    Limits shared by every archive in one upload: how many members may be
+    extracted, how large one member may be and how many bytes all of them
+    may add up to. Sizes are counted as bytes are written, so archives that
+    understate their members' sizes are caught too.
+    """
+
+    def __init__(self, max_members: int, max_member_bytes: int, max_total_bytes: int):
+        self.max_members = max_members
+        self.max_member_bytes = max_member_bytes
+        self.max_total_bytes = max_total_bytes
+        self.members = 0
+        self.total_bytes = 0
+
+    def admit(self, declared_size: int) -> None:
+        self.members += 1
+        if self.members > self.max_members:
+            raise ArchiveTooLarge(f"Upload contains more than {self.max_members} files")
+        if declared_size > self.max_member_bytes:
+            raise ArchiveTooLarge(f"Archive member exceeds {self.max_member_bytes} bytes")
+        if self.total_bytes + declared_size > self.max_total_bytes:
+            raise ArchiveTooLarge(f"Upload unpacks to more than {self.max_total_bytes} bytes")
+
+    def charge(self, member_bytes: int, chunk_bytes: int) -> None:
+        self.total_bytes += chunk_bytes
+        if member_bytes > self.max_member_bytes:
+            raise ArchiveTooLarge(f"Archive member exceeds {self.max_member_bytes} bytes")
+        if self.total_bytes > self.max_total_bytes:
+            raise ArchiveTooLarge(f"Upload unpacks to more than {self.max_total_bytes} bytes")
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_member(source, target_path: str, budget: Optional[ExtractionBudget] = None) -> str:
+    """Copy an archive member to target_path; returns its SHA-256"""
+    digest = hashlib.sha256()
+    written = 0
+    with open(target_path, "wb") as target:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if budget is not None:
+                budget.charge(written, len(chunk))
+            digest.update(chunk)
+            target.write(chunk)
+    return digest.hexdigest()
+
+
+def expand_upload(path: str, dest_dir: str, budget: Optional[ExtractionBudget] = None,
+                  sha256: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Return the files contained in an uploaded file with their SHA-256: the
+    members of a ZIP or tar archive (extracted flat into dest_dir, hashed
+    as they are written), or the file itself with the given sha256.
+    Links, directories and unsafe member names are skipped. With a budget,
+    raises ArchiveTooLarge as soon as the archive goes over it.
+    """
+    if zipfile.is_zipfile(path):
+        extracted = []
+        with zipfile.ZipFile(path) as archive:
+            for i, member in enumerate(archive.infolist()):
+                name = _safe_name(member.filename)
+                if member.is_dir() or name is None:
+                    continue
+                if budget is not None:
+                    budget.admit(member.file_size)
+                target_path = os.path.join(dest_dir, f"{i}_{name}")
+                with archive.open(member) as source:
+                    extracted.append((target_path, _copy_member(source, target_path, budget)))
+        return extracted
+
+    if tarfile.is_tarfile(path):
+        extracted = []
+        with tarfile.open(path) as archive:
+            for i, member in enumerate(archive):
+                name = _safe_name(member.name)
+                if not member.isfile() or name is None:
+                    continue
+                if budget is not None:
+                    budget.admit(member.size)
+                target_path = os.path.join(dest_dir, f"{i}_{name}")
+                extracted.append((target_path, _copy_member(archive.extractfile(member), target_path, budget)))
+        return extracted
+
+    if budget is not None:
+        size = os.path.getsize(path)
+        budget.admit(size)
+        budget.charge(size, size)
+    if sha256 is None:
+        sha256 = _file_sha256(path)
+    return [(path, sha256)]
+
+
+def _read_header(path: str) -> Tuple[str, Optional[Dataset]]:
+    try:
+        return path, pydicom.dcmread(path, stop_before_pixels=True)
+    except Exception:
+        return path, None
+
+
+def parse_headers(paths: List[str], max_workers: int = 8) -> Tuple[List[Tuple[str, Dataset]], List[str]]:
+    """
+    Parse DICOM headers (without pixel data) on a thread pool.
+    Returns (parsed (path, dataset) pairs, paths that are not DICOM)
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_read_header, paths))
+    parsed = [(path, ds) for path, ds in results if ds is not None]
+    rejected = [path for path, ds in results if ds is None]
+    return parsed, rejected
+
+
+def group_by_study(parsed: List[Tuple[str, Dataset]]) -> Dict[str, Dict[str, List[Tuple[str, Dataset]]]]:
+    """Group instances as {StudyInstanceUID: {SeriesInstanceUID: [(path, dataset)]}}"""
+    studies = OrderedDict()
+    for path, ds in parsed:
+        study_uid = str(ds.get("StudyInstanceUID", "unknown-study"))
+        series_uid = str(ds.get("SeriesInstanceUID", "unknown-series"))
+        studies.setdefault(study_uid, OrderedDict()).setdefault(series_uid, []).append((path, ds))
+    return studies
+
+
+def instance_path(base_dir: str, study_uid: str, series_uid: str, ds: Dataset, fallback: str) -> str:
+    """Final location of an instance: base_dir/study/series/sop.dcm"""
+    sop_uid = str(ds.get("SOPInstanceUID", "")) or os.path.splitext(os.path.basename(fallback))[0]
+    return os.path.join(
+        base_dir,
+        _safe_name(study_uid) or "study",
+        _safe_name(series_uid) or "series",
+        f"{_safe_name(sop_uid) or 'instance'}.dcm"
+    )
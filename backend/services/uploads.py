@@ -0,0 +1,230 @@
+import hashlib
+import os
+from io import BytesIO
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import pydicom
+from fastapi import Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from multipart.multipart import MultipartParser, parse_options_header
+from pydicom.dataset import Dataset
+
+CHUNK_SIZE = 1024 * 1024
+# Stop buffering for the header after this many bytes and read it back from disk
+HEADER_BUFFER_LIMIT = 16 * 1024 * 1024
+# The (7FE0,0010) Pixel Data tag as it appears in little and big endian files
+PIXEL_DATA_TAGS = (b"\xe0\x7f\x10\x00", b"\x7f\xe0\x00\x10")
+
+
+class StoredUpload(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+    header: Optional[Dataset]
+
+
+def _parse_header(source) -> Dataset:
+    return pydicom.dcmread(source, stop_before_pixels=True)
+
+
+def _write_chunk(buffer, digest, chunk: bytes) -> None:
+    buffer.write(chunk)
+    digest.update(chunk)
+
+
+def _try_parse_buffered(head: bytearray, complete: bool) -> Optional[Dataset]:
+    """Parse the buffered header once it reaches the pixel data (or the file ended)"""
+    if not complete and not any(tag in head for tag in PIXEL_DATA_TAGS):
+        return None
+    try:
+        return _parse_header(BytesIO(bytes(head)))
+    except Exception:
+        if complete:
+            raise
+        return None
+
+
+class UploadTooLarge(Exception):
+    """The upload passed its size limit; nothing was kept"""
+
+
+class _UploadWriter:
+    """Writes, hashes and optionally header-parses an upload as its chunks arrive"""
+
+    def __init__(self, file_path: str, parse_dicom_header: bool = False, max_bytes: Optional[int] = None):
+        self.file_path = file_path
+        self.partial_path = f"{file_path}.part"
+        self.parse_dicom_header = parse_dicom_header
+        self.max_bytes = max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = bytearray()
+        self.header = None
+        self.buffering = parse_dicom_header
+        self.buffer = None
+
+    async def open(self) -> None:
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        self.buffer = await run_in_threadpool(open, self.partial_path, "wb")
+
+    async def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        await run_in_threadpool(_write_chunk, self.buffer, self.digest, chunk)
+
+        if self.buffering:
+            self.head.extend(chunk)
+            self.header = await run_in_threadpool(_try_parse_buffered, self.head, False)
+            if self.header is not None or len(self.head) >= HEADER_BUFFER_LIMIT:
+                self.buffering = False
+                self.head = bytearray()
+
+    async def finish(self) -> StoredUpload:
+        await run_in_threadpool(self.buffer.close)
+        os.replace(self.partial_path, self.file_path)
+
+        header = self.header
+        if self.parse_dicom_header and header is None:
+            if self.head:
+                # The whole file fit in the buffer but never reached pixel data
+                header = await run_in_threadpool(_try_parse_buffered, self.head, True)
+            else:
+                # Oversized header: read just the header back from disk
+                header = await run_in_threadpool(_parse_header, self.file_path)
+        return StoredUpload(self.file_path, self.digest.hexdigest(), self.size, header)
+
+    def abort(self) -> None:
+        if self.buffer is not None:
+            self.buffer.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+async def stream_upload(upload: UploadFile, file_path: str, parse_dicom_header: bool = False,
+                        chunk_size: int = CHUNK_SIZE, max_bytes: Optional[int] = None) -> StoredUpload:
+    """
+    Copy an UploadFile to disk without blocking the event loop.
+
+    Chunks are written and hashed in the threadpool while being read, and
+    the file only appears at file_path once it is complete. With
+    parse_dicom_header, the DICOM header (everything before the pixel data)
+    is parsed from the bytes already in memory during the write, so the
+    file is never read back.
+
+    Starlette has already spooled the request body to a temporary file by
+    the time an UploadFile reaches the route, so this only avoids holding
+    the upload in memory; the body is still written and read twice. Use
+    stream_form_file to write the body once, straight from the request.
+    """
+    writer = _UploadWriter(file_path, parse_dicom_header, max_bytes)
+    await writer.open()
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            await writer.write(chunk)
+        return await writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def _disposition(headers: dict) -> Tuple[Optional[str], Optional[str]]:
+    """(field name, filename) from a part's Content-Disposition header"""
+    _, params = parse_options_header(headers.get(b"content-disposition", b""))
+    name = params.get(b"name")
+    filename = params.get(b"filename")
+    return (name.decode("latin-1") if name is not None else None,
+            filename.decode("utf-8", errors="replace") if filename is not None else None)
+
+
+async def stream_form_file(request: Request, path_for: Callable[[str], str], field: str = "file",
+                           parse_dicom_header: bool = False, max_bytes: Optional[int] = None,
+                           max_field_bytes: int = 64 * 1024) -> Tuple[StoredUpload, str, Dict[str, str]]:
+    """
+    Write one file field of a multipart/form-data request to disk as the
+    body arrives, without Starlette spooling it first. path_for(filename)
+    gives the destination. Returns (the stored file, its client filename,
+    the other plain form fields).
+
+    Raises UploadTooLarge as soon as the file passes max_bytes (or up front
+    when Content-Length already says it will), and ValueError for a
+    malformed body or a missing file field.
+    """
+    content_length = request.headers.get("content-length")
+    if max_bytes is not None and content_length and content_length.isdigit() \
+            and int(content_length) > max_bytes + max_field_bytes:
+        raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data body")
+
+    # The parser reports synchronously; events are replayed with await after each chunk
+    events = []
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_end():
+        events.append(("header", (bytes(header_field).lower(), bytes(header_value))))
+        header_field.clear()
+        header_value.clear()
+
+    callbacks = {
+        "on_part_begin": lambda: events.append(("begin", None)),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+        "on_header_field": lambda data, start, end: header_field.extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header_value.extend(data[start:end]),
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("headers", None)),
+    }
+    parser = MultipartParser(params[b"boundary"], callbacks)
+
+    writer = None
+    stored = filename = None
+    fields = {}
+    headers = {}
+    name = None
+    value = bytearray()
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, data in events:
+                if kind == "begin":
+                    headers, name, value = {}, None, bytearray()
+                elif kind == "header":
+                    headers[data[0]] = data[1]
+                elif kind == "headers":
+                    name, part_filename = _disposition(headers)
+                    if name == field and part_filename is not None and writer is None and stored is None:
+                        filename = part_filename
+                        writer = _UploadWriter(path_for(filename), parse_dicom_header, max_bytes)
+                        await writer.open()
+                elif kind == "data":
+                    if writer is not None and name == field:
+                        await writer.write(data)
+                    elif name is not None:
+                        value.extend(data)
+                        if len(value) > max_field_bytes:
+                            raise ValueError(f"Form field {name} is too large")
+                elif kind == "end":
+                    if writer is not None and name == field:
+                        stored = await writer.finish()
+                        writer = None
+                    elif name is not None:
+                        fields[name] = value.decode("utf-8", errors="replace")
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        if stored is not None and os.path.exists(stored.path):
+            os.remove(stored.path)
+        raise
+
+    if stored is None:
+        raise ValueError(f"No file in form field {field}")
+    return stored, filename, fields
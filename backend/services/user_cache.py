@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from decouple import config
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from models.models import User
+
+_INVALIDATED = "user_cache_invalidated"
+
+
+def detached_copy(user: User) -> User:
+    """A session-free User with the row's column values"""
+    return User(**{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+
+
+class UserCache:
+    """
+    Authenticated users by token subject (username), so that a request does
+    not look its user up again for every call.
+
+    Entries are session-free copies of the row, kept for ``ttl`` seconds
+    and at most ``max_entries`` at a time (least recently used first out).
+    After ``listen()``, any ORM change to a user (deactivation, a lockout,
+    a new role, a rename) drops its entry when the transaction commits;
+    writes outside the ORM or in other processes are seen once the entry
+    expires.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def listen(self) -> None:
+        if not event.contains(Session, "after_flush", self._after_flush):
+            event.listen(Session, "after_flush", self._after_flush)
+            event.listen(Session, "after_commit", self._after_commit)
+
+    def get(self, username: str) -> Optional[User]:
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return user
+
+    def store(self, user: User) -> User:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return user
+        copy = detached_copy(user)
+        with self._lock:
+            self._entries[copy.username] = (copy, time.monotonic() + self.ttl)
+            self._entries.move_to_end(copy.username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return copy
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        usernames = session.info.setdefault(_INVALIDATED, set())
+        for obj in list(session.dirty) + list(session.deleted):
+            if isinstance(obj, User):
+                usernames.add(obj.username)
+                # A rename leaves the old subject cached too
+                usernames.update(inspect(obj).attrs.username.history.deleted or ())
+        for username in usernames:
+            self.invalidate(username)
+
+    def _after_commit(self, session: Session) -> None:
+        # Again at commit, in case a request cached the row between flush and commit
+        for username in session.info.pop(_INVALIDATED, ()):
+            self.invalidate(username)
+
+
+user_cache = UserCache(
+    ttl=config('AUTH_USER_CACHE_TTL', default=30.0, cast=float),
+    max_entries=config('AUTH_USER_CACHE_SIZE', default=10000, cast=int)
+)
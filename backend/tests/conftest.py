@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ai_model lives next to the backend
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+# Settings read when the app modules are imported
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("STORAGE_DIR", tempfile.mkdtemp(prefix="detcetra-uploads-"))
+os.environ.setdefault("STORAGE_REFS_PATH", os.path.join(tempfile.mkdtemp(prefix="detcetra-refs-"), "refs.db"))
+os.environ.setdefault("PREVIEW_CACHE_DIR", tempfile.mkdtemp(prefix="detcetra-previews-"))
+
+
+@pytest.fixture
+def count_queries():
+    """Collects the SQL statements executed on any engine while the test runs"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", record)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+pydicom = pytest.importorskip("pydicom")
+pytest.importorskip("torch")
+
+from pydicom.dataset import Dataset, FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, SecondaryCaptureImageStorage, generate_uid
+
+from ai_model import dicom_loader
+
+
+def write_dicom(path, frames, bits_stored, signed):
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SecondaryCaptureImageStorage
+    meta.MediaStorageSOPInstanceUID = generate_uid()
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = meta.MediaStorageSOPClassUID
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "OT"
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.NumberOfFrames = frames.shape[0]
+    ds.Rows, ds.Columns = frames.shape[1:]
+    ds.BitsAllocated = 16
+    ds.BitsStored = bits_stored
+    ds.HighBit = bits_stored - 1
+    ds.PixelRepresentation = 1 if signed else 0
+    ds.PixelData = frames.astype("<i2" if signed else "<u2").tobytes()
+    ds.save_as(str(path), enforce_file_format=True)
+
+
+@pytest.mark.parametrize("signed", [False, True])
+def test_memmap_path_matches_pydicom_decoding(tmp_path, monkeypatch, signed):
+    rng = np.random.default_rng(0)
+    stored = rng.integers(-2048 if signed else 0, 2048 if signed else 4096, size=(3, 64, 64))
+    # Set the unused high bits, as overlays or sloppy writers do
+    raw = (stored & 0xFFF) | 0xA000
+    path = tmp_path / "frames.dcm"
+    write_dicom(path, raw.astype(np.uint16).view(np.int16) if signed else raw, 12, signed)
+
+    memmapped = dicom_loader.read_dicom_pixels(str(path), size=16)
+    monkeypatch.setattr(dicom_loader, "_pixel_memmap", lambda path, ds: None)
+    decoded = dicom_loader.read_dicom_pixels(str(path), size=16)
+    np.testing.assert_allclose(memmapped, decoded, atol=1e-6)
+
+
+def test_stored_bits_sign_extends():
+    ds = Dataset()
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.PixelRepresentation = 1
+    raw = np.array([0x0FFF, 0x0800, 0x07FF, 0xF001], dtype=np.uint16).view(np.int16)
+    assert dicom_loader._stored_bits(raw, ds).tolist() == [-1, -2048, 2047, 1]
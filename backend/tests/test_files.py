@@ -0,0 +1,68 @@
+import asyncio
+from io import BytesIO
+
+import pytest
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+
+from models.models import User, UserRole
+from auth.auth import get_current_active_user
+from routes import files
+from services.storage import StorageService
+
+app = FastAPI()
+app.include_router(files.router, prefix="/api")
+app.dependency_overrides[get_current_active_user] = lambda: User(id=1, username="reader", role=UserRole.RADIOLOGIST)
+client = TestClient(app)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = StorageService(str(tmp_path / "uploads"), refs_path=str(tmp_path / "refs.db"))
+    monkeypatch.setattr(files, "storage_service", storage)
+    (tmp_path / "secret.txt").write_text("secret")
+    (tmp_path / "uploads" / "images").mkdir()
+    (tmp_path / "uploads" / "images" / "1_legacy.png").write_bytes(b"legacy")
+    (tmp_path / "uploads" / "tmp" / "partial").write_bytes(b"partial")
+    return storage
+
+
+def test_serves_stored_and_legacy_files(storage):
+    key = asyncio.run(storage.save_image(UploadFile(file=BytesIO(b"image"), filename="a.png"), "1"))
+    response = client.get(f"/api/files/{key}")
+    assert response.status_code == 200
+    assert response.content == b"image"
+
+    response = client.get("/api/files/images/1_legacy.png")
+    assert response.status_code == 200
+    assert response.content == b"legacy"
+
+
+@pytest.mark.parametrize("path", [
+    "refs.db",
+    "tmp/partial",
+    "images",
+    "images/../refs.db",
+    "images/%2e%2e/refs.db",
+    "images/%2e%2e/%2e%2e/secret.txt",
+    "/etc/passwd",
+    "//etc/passwd",
+    "images//1_legacy.png",
+    "objects/../../secret.txt",
+])
+def test_rejects_paths_outside_stored_files(storage, path):
+    response = client.get(f"/api/files/{path}")
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("key", [
+    "//etc/passwd", "/etc/passwd", "images/./1_legacy.png", "images\\..\\refs.db", "images/", "",
+])
+def test_servable_path_rejects_unnormalized_keys(storage, key):
+    # Clients may normalize these before sending, so check the raw keys too
+    assert storage.servable_path(key) is None
+
+
+def test_rejects_symlink_out_of_store(storage, tmp_path):
+    (tmp_path / "uploads" / "images" / "link.png").symlink_to(tmp_path / "secret.txt")
+    assert client.get("/api/files/images/link.png").status_code == 404
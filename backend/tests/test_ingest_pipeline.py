@@ -0,0 +1,105 @@
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.models import Base, Case, CaseStatus
+from services.ingest_pipeline import IngestPipeline
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+class CachedEngine:
+    """Every image is already in the prediction cache"""
+
+    def __init__(self):
+        self.decoded = []
+
+    def cached_prediction(self, image_path):
+        return "key", {"label": "normal", "confidence": 0.8, "heatmap": "static/heatmaps/cached.png"}
+
+    def cache_prediction(self, key, result):
+        pass
+
+    def load_tensor(self, image_path):
+        self.decoded.append(image_path)
+        raise AssertionError("cached images should not be decoded")
+
+
+def test_cached_predictions_skip_inference():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    case = Case(patient_id="P1", case_number="C1", image_path="image.png", status=CaseStatus.PENDING)
+    db.add(case)
+    db.commit()
+    case_id = case.id
+    db.close()
+
+    inference = CachedEngine()
+    pipeline = IngestPipeline(inference, TestingSessionLocal)
+    assert pipeline.submit(case_id, "image.png")
+
+    for _ in range(100):
+        db = TestingSessionLocal()
+        prediction = db.query(Case.ai_prediction).filter(Case.id == case_id).scalar()
+        db.close()
+        if prediction:
+            break
+        time.sleep(0.02)
+    assert prediction == "normal"
+    assert inference.decoded == []
+    Base.metadata.drop_all(bind=engine)
+
+
+class FlakyEngine:
+    """Nothing is cached; the first forward pass fails"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def cached_prediction(self, image_path):
+        return "key", None
+
+    def cache_prediction(self, key, result):
+        raise RuntimeError("cache is read-only")
+
+    def load_tensor(self, image_path):
+        return image_path
+
+    def predict_tensors(self, image_paths, tensors, heatmaps=False):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("out of memory")
+        return [{"label": "normal", "confidence": 0.7, "heatmap": None} for _ in image_paths]
+
+
+def test_predict_thread_survives_errors():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    cases = [Case(patient_id=f"P{i}", case_number=f"C{i}", image_path="image.png", status=CaseStatus.PENDING)
+             for i in range(2)]
+    db.add_all(cases)
+    db.commit()
+    first, second = cases[0].id, cases[1].id
+    db.close()
+
+    pipeline = IngestPipeline(FlakyEngine(), TestingSessionLocal, batch_size=1, max_wait_ms=0)
+    assert pipeline.submit(first, "first.png")
+    time.sleep(0.1)
+    assert pipeline.submit(second, "second.png")
+
+    for _ in range(100):
+        db = TestingSessionLocal()
+        prediction = db.query(Case.ai_prediction).filter(Case.id == second).scalar()
+        db.close()
+        if prediction:
+            break
+        time.sleep(0.02)
+    assert prediction == "normal"
+    Base.metadata.drop_all(bind=engine)
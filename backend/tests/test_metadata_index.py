@@ -0,0 +1,46 @@
+from pydicom.dataset import Dataset
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.models import Base, Case
+from services.metadata_index import MetadataIndex
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _ingest(db, index):
+    ds = Dataset()
+    ds.PatientID = "P1"
+    ds.Modality = "MG"
+    case = Case(patient_id="P1", case_number="C1", image_path="image.dcm")
+    db.add(case)
+    db.flush()
+    index.store(db, case.id, ds)
+    return case.id
+
+
+def test_store_is_cached_only_after_commit():
+    Base.metadata.create_all(bind=engine)
+    index = MetadataIndex()
+
+    db = TestingSessionLocal()
+    case_id = _ingest(db, index)
+    db.rollback()
+    db.close()
+    # The rolled-back tags are neither cached nor in the table
+    assert index.get(TestingSessionLocal(), case_id) is None
+
+    db = TestingSessionLocal()
+    case_id = _ingest(db, index)
+    assert case_id not in index._entries
+    db.commit()
+    db.close()
+    assert index._entries[case_id] == {"PatientID": "P1", "Modality": "MG"}
+
+    Base.metadata.drop_all(bind=engine)
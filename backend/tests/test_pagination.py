@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.models import Base, Case
+from services.pagination import decode_cursor, encode_cursor, keyset_page
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture(scope="module")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    # Groups of three cases share a timestamp, so pages must break ties on id
+    for i in range(10):
+        db.add(Case(patient_id=f"P{i}", case_number=f"C{i}", image_path="a.png",
+                    created_at=start + timedelta(seconds=i // 3)))
+    db.commit()
+    yield db
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+
+
+def _walk(db, limit, descending):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(db.query(Case), Case, cursor, limit, descending)
+        pages.append([case.id for case in rows])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("limit", [1, 3, 4, 10, 20])
+def test_pages_cover_every_row_once_in_order(db, limit, descending):
+    expected = [case.id for case in sorted(
+        db.query(Case).all(), key=lambda case: (case.created_at, case.id), reverse=descending
+    )]
+    pages = _walk(db, limit, descending)
+    assert [case_id for page in pages for case_id in page] == expected
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_last_page_has_no_cursor(db):
+    rows, cursor = keyset_page(db.query(Case), Case, None, 10, True)
+    assert len(rows) == 10
+    assert cursor is None
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 1, 1, 12, 0, 0, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "e30", encode_cursor(datetime(2026, 1, 1), 1)[:-4]])
+def test_invalid_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
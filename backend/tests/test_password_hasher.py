@@ -0,0 +1,127 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import get_db
+from models.models import Base, User, UserRole
+from routes import auth as auth_routes
+from services.password_hasher import HasherBusy, PasswordHasher
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _blocking_hasher(release: threading.Event, started: threading.Event) -> PasswordHasher:
+    def verify(plain, hashed):
+        started.set()
+        release.wait(10)
+        return plain == hashed
+    return PasswordHasher(verify, lambda password: password, workers=1, max_queue=0)
+
+
+def test_busy_when_saturated_and_slot_held_until_hash_finishes():
+    release, started = threading.Event(), threading.Event()
+    hasher = _blocking_hasher(release, started)
+
+    async def scenario():
+        first = asyncio.ensure_future(hasher.verify("a", "a"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        with pytest.raises(HasherBusy):
+            await hasher.verify("b", "b")
+
+        # A cancelled request doesn't free the slot while bcrypt is still running
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert hasher.pending == 1
+        with pytest.raises(HasherBusy):
+            await hasher.verify("b", "b")
+
+        release.set()
+        for _ in range(100):
+            if hasher.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await hasher.verify("c", "c")
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        release.set()
+        hasher.shutdown()
+
+
+def test_login_returns_503_with_retry_after_when_busy(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    db.add(User(username="reader", email="reader@example.com", hashed_password="x", role=UserRole.RADIOLOGIST))
+    db.commit()
+    db.close()
+
+    release, started = threading.Event(), threading.Event()
+    hasher = _blocking_hasher(release, started)
+    monkeypatch.setattr(auth_routes, "password_hasher", hasher)
+    # Occupy the only slot from another thread
+    holder = threading.Thread(target=lambda: asyncio.run(hasher.verify("x", "x")))
+    holder.start()
+    started.wait(10)
+
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    app.dependency_overrides[get_db] = lambda: TestingSessionLocal()
+    try:
+        response = TestClient(app).post("/api/auth/token", data={"username": "reader", "password": "x"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+        holder.join()
+        hasher.shutdown()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_register_hashes_in_the_pool_and_returns_503_when_busy(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    release, started = threading.Event(), threading.Event()
+    hasher = PasswordHasher(lambda plain, hashed: plain == hashed, lambda password: f"hashed:{password}",
+                            workers=1, max_queue=0)
+    monkeypatch.setattr(auth_routes, "password_hasher", hasher)
+
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    app.dependency_overrides[get_db] = lambda: TestingSessionLocal()
+    client = TestClient(app)
+    body = {"username": "new", "email": "new@example.com", "role": "radiologist", "password": "secret"}
+    holder = None
+    try:
+        assert client.post("/api/auth/register", json=body).status_code == 200
+        db = TestingSessionLocal()
+        assert db.query(User).filter(User.username == "new").one().hashed_password == "hashed:secret"
+        db.close()
+
+        # Occupy the only slot from another thread
+        blocking = _blocking_hasher(release, started)
+        monkeypatch.setattr(auth_routes, "password_hasher", blocking)
+        holder = threading.Thread(target=lambda: asyncio.run(blocking.verify("x", "x")))
+        holder.start()
+        started.wait(10)
+        response = client.post("/api/auth/register", json=dict(body, username="other", email="other@example.com"))
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+        if holder is not None:
+            holder.join()
+            blocking.shutdown()
+        hasher.shutdown()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models.models import Base, Case, CaseStatus, JobStatus, PredictionJob
+from services.prediction_jobs import PredictionJobQueue
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # A file database, so jobs finishing together in the threadpool each get
+    # their own connection instead of sharing one
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+class Predictor:
+    async def predict(self, image_path):
+        return {"label": "normal", "confidence": 0.9, "heatmap": None}
+
+
+def test_resume_picks_up_queued_and_orphaned_jobs(session_factory):
+    db = session_factory()
+    case = Case(patient_id="P1", case_number="C1", image_path="image.png", status=CaseStatus.PENDING)
+    db.add(case)
+    db.flush()
+    # Left behind by a previous process: one waiting, one interrupted mid-run
+    db.add_all([
+        PredictionJob(case_id=case.id, status=JobStatus.QUEUED),
+        PredictionJob(case_id=case.id, status=JobStatus.RUNNING,
+                      started_at=datetime.utcnow() - timedelta(hours=1)),
+    ])
+    db.commit()
+    db.close()
+
+    queue = PredictionJobQueue(session_factory, Predictor(), poll_interval=0.05, stale_after=60)
+
+    async def run():
+        await queue.resume()
+        for _ in range(100):
+            db = session_factory()
+            statuses = [job.status for job in db.query(PredictionJob)]
+            db.close()
+            if all(status == JobStatus.COMPLETED for status in statuses):
+                return statuses
+            await asyncio.sleep(0.05)
+        return statuses
+
+    assert asyncio.run(run()) == [JobStatus.COMPLETED, JobStatus.COMPLETED]
+
+
+def test_enqueue_many_queues_a_job_per_case(session_factory):
+    db = session_factory()
+    cases = [Case(patient_id=f"P{i}", case_number=f"C{i}", image_path="image.png", status=CaseStatus.PENDING)
+             for i in range(3)]
+    db.add_all(cases)
+    db.commit()
+    queue = PredictionJobQueue(session_factory, Predictor(), poll_interval=0.05)
+
+    async def run():
+        job_ids = queue.enqueue_many(db, [case.id for case in cases])
+        for _ in range(100):
+            jobs = [queue.get(job_id) for job_id in job_ids]
+            if all(job["status"] == JobStatus.COMPLETED.value for job in jobs):
+                return jobs
+            await asyncio.sleep(0.05)
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert [job["case_id"] for job in jobs] == [case.id for case in cases]
+    assert all(job["prediction"] == "normal" for job in jobs)
+    db.close()
+
+
+def test_worker_survives_claim_errors(session_factory):
+    queue = PredictionJobQueue(session_factory, Predictor(), poll_interval=0.01)
+    claim = queue._claim
+    failures = []
+
+    def flaky_claim(limit):
+        if len(failures) < 2:
+            failures.append(limit)
+            raise RuntimeError("database is unavailable")
+        return claim(limit)
+    queue._claim = flaky_claim
+
+    db = session_factory()
+    case = Case(patient_id="P1", case_number="C1", image_path="image.png", status=CaseStatus.PENDING)
+    db.add(case)
+    db.commit()
+
+    async def run():
+        job = queue.enqueue(db, case.id)
+        for _ in range(100):
+            if queue.get(job.id)["status"] == JobStatus.COMPLETED.value:
+                return True
+            await asyncio.sleep(0.02)
+        return False
+
+    assert asyncio.run(run())
+    assert len(failures) == 2
+    db.close()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from database.database import get_db, get_async_db
+from models.models import Base, User, Case, Review, CaseStatus, UserRole
+from auth.auth import get_current_active_user
+from routes import cases
+
+# A file, so the sync seeding engine and the async engine the routes use share it
+db_path = os.path.join(tempfile.mkdtemp(prefix="detcetra-db-"), "test.db")
+engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncTestingSessionLocal = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+app = FastAPI()
+app.include_router(cases.router, prefix="/api")
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_current_active_user] = lambda: User(id=1, username="reader", role=UserRole.RADIOLOGIST)
+client = TestClient(app)
+
+@pytest.fixture(scope="module", autouse=True)
+def seeded_cases():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    user = User(username="reader", email="reader@example.com", hashed_password="x", role=UserRole.RADIOLOGIST)
+    db.add(user)
+    db.flush()
+    for i in range(20):
+        case = Case(patient_id=f"P{i}", case_number=f"CASE{i}", status=CaseStatus.PENDING, creator_id=user.id)
+        case.reviews = [Review(reviewer_id=user.id, findings=f"Finding {i}.{j}") for j in range(2)]
+        db.add(case)
+    db.commit()
+    db.close()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+def test_case_list_loads_reviews_in_one_query(count_queries):
+    response = client.get("/api/cases/?limit=20")
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+    assert all(len(case["reviews"]) == 2 for case in response.json())
+    # The cases, then every page's reviews at once
+    assert len(count_queries) == 2
+
+def test_case_list_without_reviews(count_queries):
+    response = client.get("/api/cases/?limit=20&include=")
+    assert response.status_code == 200
+    assert all("reviews" not in case for case in response.json())
+    assert len(count_queries) == 1
+
+def test_case_list_fields(count_queries):
+    response = client.get("/api/cases/?limit=5&include=&fields=id,case_number")
+    assert response.status_code == 200
+    assert all(set(case) == {"id", "case_number"} for case in response.json())
+    assert len(count_queries) == 1
+
+def test_case_detail(count_queries):
+    case_id = client.get("/api/cases/?limit=1&include=&fields=id").json()[0]["id"]
+    count_queries.clear()
+    response = client.get(f"/api/cases/{case_id}")
+    assert response.status_code == 200
+    assert len(response.json()["reviews"]) == 2
+    assert len(count_queries) == 2
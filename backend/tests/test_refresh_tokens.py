@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import get_db
+from models.models import Base, RefreshToken, User, UserRole
+from auth import create_access_token, refresh_tokens, token_claims
+from routes import auth as auth_routes
+from services.refresh_tokens import RefreshTokenStore, InvalidRefreshToken
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+store = RefreshTokenStore("test-secret", "HS256", timedelta(days=1))
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+
+def test_rotation_issues_a_new_token(db):
+    token = store.issue(db, 1, "reader")
+    user_id, rotated = store.rotate(db, token)
+    assert user_id == 1
+    assert rotated != token
+    assert store.rotate(db, rotated)[0] == 1
+
+def test_replay_revokes_the_family(db):
+    token = store.issue(db, 1, "reader")
+    _, rotated = store.rotate(db, token)
+    with pytest.raises(InvalidRefreshToken):
+        store.rotate(db, token)
+    # The thief's replay also signs out the legitimate holder
+    with pytest.raises(InvalidRefreshToken):
+        store.rotate(db, rotated)
+    assert db.query(RefreshToken).count() == 0
+
+def test_revoke_and_prune(db):
+    token = store.issue(db, 1, "reader")
+    store.revoke(db, token)
+    with pytest.raises(InvalidRefreshToken):
+        store.rotate(db, token)
+
+    expired = RefreshTokenStore("test-secret", "HS256", timedelta(seconds=-1))
+    expired.issue(db, 2, "other")
+    assert store.prune(db) == 1
+    with pytest.raises(InvalidRefreshToken):
+        store.rotate(db, "not-a-token")
+
+def test_refresh_token_is_not_an_access_token(db):
+    user = User(username="reader", email="reader@example.com", hashed_password="x", role=UserRole.RADIOLOGIST)
+    db.add(user)
+    db.commit()
+
+    app = FastAPI()
+    app.include_router(auth_routes.router)
+    app.dependency_overrides[get_db] = lambda: db
+    client = TestClient(app)
+
+    access_token = create_access_token(token_claims(user))
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 200
+
+    refresh_token = refresh_tokens.issue(db, user.id, user.username)
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {refresh_token}"})
+    assert response.status_code == 401
@@ -0,0 +1,119 @@
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models.models import Base, Case, Review, User, UserRole
+from services.search import SearchIndex
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def _setup():
+    Base.metadata.create_all(bind=engine)
+    index = SearchIndex()
+    index.listen()
+    db = TestingSessionLocal()
+    user = User(username="reader", email="reader@example.com", hashed_password="x", role=UserRole.RADIOLOGIST)
+    db.add(user)
+    db.flush()
+    return index, db, user
+
+
+def _teardown(db, index):
+    db.close()
+    event.remove(Session, "after_flush", index._after_flush)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS search_documents"))
+        connection.execute(text("DROP TABLE IF EXISTS search_document_rows"))
+    Base.metadata.drop_all(bind=engine)
+
+
+def _hits(index, db, query, doc_types=None):
+    return [(hit["type"], hit["id"]) for hit in index.search(db, query, doc_types)]
+
+
+def _rows(db):
+    connection = db.connection()
+    return (
+        connection.execute(text("SELECT count(*) FROM search_documents")).scalar(),
+        connection.execute(text("SELECT count(*) FROM search_document_rows")).scalar(),
+    )
+
+
+def test_upsert_replaces_and_delete_removes_documents():
+    index, db, user = _setup()
+    try:
+        case = Case(patient_id="P1", case_number="C1", image_path="a.png", notes="dense breast tissue")
+        db.add(case)
+        db.flush()
+        review = Review(case_id=case.id, reviewer_id=user.id, findings="spiculated mass upper outer quadrant")
+        db.add(review)
+        db.commit()
+        assert _hits(index, db, "spiculated") == [("review", review.id)]
+        assert _hits(index, db, "dense") == [("case", case.id)]
+
+        review.findings = "benign calcification"
+        db.commit()
+        assert _hits(index, db, "spiculated") == []
+        assert _hits(index, db, "calcif") == [("review", review.id)]
+        assert _rows(db) == (2, 2)
+
+        index.upsert(db.connection(), "report", case.id, case.id, "calcification noted in report")
+        db.commit()
+        assert sorted(_hits(index, db, "calcification")) == [("report", case.id), ("review", review.id)]
+        assert _hits(index, db, "calcification", ["report"]) == [("report", case.id)]
+
+        db.delete(review)
+        db.commit()
+        assert _hits(index, db, "calcification") == [("report", case.id)]
+
+        # Deleting the case removes its notes and its report text
+        db.delete(case)
+        db.commit()
+        assert _hits(index, db, "calcification") == []
+        assert _hits(index, db, "dense") == []
+        assert _rows(db) == (0, 0)
+    finally:
+        _teardown(db, index)
+
+
+def test_snippets_escape_document_text():
+    index, db, _ = _setup()
+    try:
+        case = Case(patient_id="P1", case_number="C1", image_path="a.png",
+                    notes="<script>alert(1)</script> mass & density")
+        db.add(case)
+        db.commit()
+        [hit] = index.search(db, "mass")
+        assert "<script>" not in hit["snippet"]
+        assert "&lt;script&gt;" in hit["snippet"]
+        assert "<b>mass</b> &amp; density" in hit["snippet"]
+    finally:
+        _teardown(db, index)
+
+
+def test_existing_index_is_mapped_on_first_use():
+    index, db, _ = _setup()
+    try:
+        # An index built before search_document_rows existed
+        connection = db.connection()
+        index.create(connection)
+        connection.execute(text("DROP TABLE search_document_rows"))
+        connection.execute(text(
+            "INSERT INTO search_documents (doc_type, doc_id, case_id, body) VALUES ('case', 7, 7, 'old notes')"
+        ))
+        db.commit()
+
+        fresh = SearchIndex()
+        fresh.upsert(db.connection(), "case", 7, 7, "new notes")
+        db.commit()
+        assert _hits(fresh, db, "old") == []
+        assert _hits(fresh, db, "new") == [("case", 7)]
+        assert _rows(db) == (1, 1)
+    finally:
+        _teardown(db, index)
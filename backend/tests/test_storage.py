@@ -0,0 +1,82 @@
+import asyncio
+import hashlib
+from io import BytesIO
+
+from fastapi import FastAPI, UploadFile
+from fastapi.staticfiles import StaticFiles
+from fastapi.testclient import TestClient
+
+from services.storage import StorageService, content_key, storage_from_config
+
+
+def _upload(data: bytes, filename: str = "scan.png") -> UploadFile:
+    return UploadFile(file=BytesIO(data), filename=filename)
+
+
+def _save(storage, data, filename="scan.png"):
+    return asyncio.run(storage.save_image(_upload(data, filename), "1"))
+
+
+def test_identical_uploads_share_one_blob(tmp_path):
+    storage = StorageService(str(tmp_path / "uploads"), refs_path=str(tmp_path / "refs.db"))
+    first = _save(storage, b"image bytes")
+    second = _save(storage, b"image bytes", "copy.PNG")
+
+    assert first == second == content_key(hashlib.sha256(b"image bytes").hexdigest(), ".png")
+    assert storage.reference_count(first) == 2
+    assert len([p for p in (tmp_path / "uploads" / "objects").rglob("*") if p.is_file()]) == 1
+    # Nothing is left behind in the staging directory
+    assert list((tmp_path / "uploads" / "tmp").iterdir()) == []
+
+
+def test_blob_removed_with_last_reference(tmp_path):
+    storage = StorageService(str(tmp_path / "uploads"), refs_path=str(tmp_path / "refs.db"))
+    key = _save(storage, b"image bytes")
+    _save(storage, b"image bytes")
+    other = _save(storage, b"other bytes")
+
+    assert storage.delete_file(key)
+    assert storage.reference_count(key) == 1
+    assert storage.get_file_path(key) is not None
+
+    assert storage.delete_file(key)
+    assert storage.reference_count(key) == 0
+    assert storage.get_file_path(key) is None
+    assert not storage.delete_file(key)
+
+    # Other content is unaffected
+    assert storage.get_file_path(other).read_bytes() == b"other bytes"
+
+
+def test_unsafe_suffix_is_dropped(tmp_path):
+    storage = StorageService(str(tmp_path / "uploads"), refs_path=str(tmp_path / "refs.db"))
+    key = _save(storage, b"data", "report.p/../../x")
+    assert key == content_key(hashlib.sha256(b"data").hexdigest())
+
+
+def test_reference_counts_are_not_served_as_static_files(tmp_path, monkeypatch):
+    # The default layout, with /static mounted as in main.py
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("STORAGE_DIR", "static/uploads")
+    monkeypatch.delenv("STORAGE_REFS_PATH", raising=False)
+    storage = storage_from_config()
+    key = _save(storage, b"image bytes")
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+    client = TestClient(app)
+
+    assert (tmp_path / "storage_refs.db").exists()
+    assert not list((tmp_path / "static").rglob("*.db"))
+    assert client.get("/static/uploads/refs.db").status_code == 404
+    assert client.get("/static/uploads/storage_refs.db").status_code == 404
+    assert storage.reference_count(key) == 1
+
+
+def test_legacy_reference_file_is_moved_out_of_uploads(tmp_path):
+    storage = StorageService(str(tmp_path / "uploads"), refs_path=str(tmp_path / "uploads" / "refs.db"))
+    key = _save(storage, b"image bytes")
+    storage._refs.close()
+
+    moved = StorageService(str(tmp_path / "uploads"), refs_path=str(tmp_path / "private" / "refs.db"))
+    assert not (tmp_path / "uploads" / "refs.db").exists()
+    assert moved.reference_count(key) == 1
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import zipfile
+
+import pytest
+
+from services.study_ingest import ArchiveTooLarge, ExtractionBudget, expand_upload
+
+
+def _zip(path, members):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return str(path)
+
+
+def test_expand_upload_within_budget(tmp_path):
+    archive = _zip(tmp_path / "study.zip", {"a.dcm": b"a" * 10, "b/c.dcm": b"c" * 10, "../evil": b"x"})
+    budget = ExtractionBudget(max_members=2, max_member_bytes=10, max_total_bytes=20)
+    extracted = expand_upload(archive, str(tmp_path), budget)
+    assert sorted((os.path.basename(path), sha256) for path, sha256 in extracted) == [
+        ("0_a.dcm", hashlib.sha256(b"a" * 10).hexdigest()),
+        ("1_b_c.dcm", hashlib.sha256(b"c" * 10).hexdigest()),
+    ]
+    assert budget.total_bytes == 20
+
+
+def test_plain_file_is_returned_with_its_digest(tmp_path):
+    path = tmp_path / "image.dcm"
+    path.write_bytes(b"dicom")
+    assert expand_upload(str(path), str(tmp_path)) == [(str(path), hashlib.sha256(b"dicom").hexdigest())]
+    assert expand_upload(str(path), str(tmp_path), sha256="known") == [(str(path), "known")]
+
+
+@pytest.mark.parametrize("limits", [
+    dict(max_members=1, max_member_bytes=1 << 20, max_total_bytes=1 << 20),
+    dict(max_members=10, max_member_bytes=1000, max_total_bytes=1 << 20),
+    dict(max_members=10, max_member_bytes=1 << 20, max_total_bytes=1500),
+])
+def test_expand_upload_over_budget(tmp_path, limits):
+    # Highly compressible members, as in a zip bomb
+    archive = _zip(tmp_path / "bomb.zip", {"a.dcm": b"\0" * 1024, "b.dcm": b"\0" * 1024})
+    with pytest.raises(ArchiveTooLarge):
+        expand_upload(archive, str(tmp_path), ExtractionBudget(**limits))
+
+
+def test_budget_counts_bytes_written_not_declared(tmp_path):
+    budget = ExtractionBudget(max_members=10, max_member_bytes=100, max_total_bytes=1000)
+    budget.admit(declared_size=1)
+    with pytest.raises(ArchiveTooLarge):
+        budget.charge(member_bytes=101, chunk_bytes=101)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database.database import get_db
+from models.models import Base, User, UserRole
+from auth import auth as auth_module
+from auth.auth import create_access_token, get_current_active_user, token_claims
+from routes import auth as auth_routes
+from services.user_cache import user_cache
+
+engine = create_engine(
+    "sqlite://",
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+app = FastAPI()
+
+@app.get("/whoami")
+async def whoami(current_user: User = Depends(get_current_active_user)):
+    return {"id": current_user.id, "role": current_user.role}
+
+def override_get_db():
+    db = TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+app.dependency_overrides[get_db] = override_get_db
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def reader():
+    Base.metadata.create_all(bind=engine)
+    user_cache.listen()
+    user_cache.invalidate()
+    db = TestingSessionLocal()
+    user = User(username="reader", email="reader@example.com", hashed_password="x", role=UserRole.RADIOLOGIST)
+    db.add(user)
+    db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(token_claims(user))}"}
+    db.close()
+    yield headers
+    Base.metadata.drop_all(bind=engine)
+
+def test_user_is_looked_up_once(reader, count_queries):
+    assert client.get("/whoami", headers=reader).status_code == 200
+    assert client.get("/whoami", headers=reader).status_code == 200
+    assert len(count_queries) == 1
+
+def test_deactivation_invalidates(reader):
+    assert client.get("/whoami", headers=reader).status_code == 200
+    db = TestingSessionLocal()
+    db.query(User).filter(User.username == "reader").first().is_active = False
+    db.commit()
+    db.close()
+    assert client.get("/whoami", headers=reader).status_code == 403
+
+def test_trusted_claims_mode(reader, monkeypatch):
+    monkeypatch.setattr(auth_module, "TRUST_TOKEN_CLAIMS", True)
+    me = FastAPI()
+    me.include_router(auth_routes.router)
+    me.dependency_overrides[get_db] = override_get_db
+    response = TestClient(me).get("/api/auth/me", headers=reader)
+    assert response.status_code == 200
+    assert response.json()["email"] == "reader@example.com"
+    assert response.json()["created_at"]
+
+    # A lock in the token is enforced without the database
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.username == "reader").first()
+    user.account_locked_until = datetime.utcnow() + timedelta(minutes=5)
+    locked = {"Authorization": f"Bearer {create_access_token(token_claims(user))}"}
+    db.close()
+    assert client.get("/whoami", headers=locked).status_code == 403
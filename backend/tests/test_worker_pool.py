@@ -0,0 +1,65 @@
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from ai_model import worker_pool
+from ai_model.worker_pool import InferenceClient, InferencePool
+
+
+class EchoEngine:
+    """Stands in for InferenceEngine: returns the path, or hangs on 'slow'"""
+
+    def warmup(self):
+        pass
+
+    def predict_batch(self, paths):
+        if "slow" in paths:
+            time.sleep(60)
+        return [{"path": path} for path in paths]
+
+
+@pytest.fixture
+def pool(tmp_path):
+    address = str(tmp_path / "run" / "inference.sock")
+    pool = InferencePool(EchoEngine(), num_workers=1, max_wait_ms=0, address=address)
+    pool.start()
+    threading.Thread(target=pool.serve_forever, daemon=True).start()
+    for _ in range(100):
+        if os.path.exists(address):
+            break
+        time.sleep(0.05)
+    yield pool
+    for worker in pool._workers:
+        worker.kill()
+
+
+def test_client_needs_a_key(tmp_path):
+    with pytest.raises(RuntimeError):
+        InferenceClient(str(tmp_path / "inference.sock"))
+
+
+def test_socket_and_key_are_private(pool):
+    directory = os.path.dirname(pool.address)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(pool.address).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.join(directory, worker_pool.AUTHKEY_FILE)).st_mode) == 0o600
+
+
+def test_round_trip_and_timeout(pool):
+    # The worker imports torch on start, so the first answer can take a while
+    client = InferenceClient(pool.address, timeout=60)
+    assert client.predict_batch(["a.dcm", "b.dcm"]) == [{"path": "a.dcm"}, {"path": "b.dcm"}]
+    client.timeout = 1
+    # Like the engine, a failed item comes back as None instead of raising
+    assert client.predict_batch(["slow"]) == [None]
+    assert client._pending == {}
+    client.close()
+
+
+def test_wrong_key_is_rejected(pool):
+    client = InferenceClient(pool.address, authkey="not-the-key")
+    with pytest.raises(ConnectionError):
+        client.submit("a.dcm")